@@ -0,0 +1,30 @@
+import pygame
+from settings import *
+from sprites import Generic
+
+
+class StaticLayerBaker:
+    def __init__(self):
+        # (z, y_sort) -> chunk key -> [(pos, surf), ...] in the order the tiles were added
+        self.tiles = {}
+        self.chunk_pixels = CHUNK_SIZE * TILE_SIZE
+
+    def add(self, pos, surf, z, y_sort=False):
+        # y_sort tiles have to keep sorting against the player,so they are baked into one strip per tile row
+        # instead of one surface per chunk.the strip has the same centery as the tiles it is made of.
+        key = (pos[0] // self.chunk_pixels, pos[1] // TILE_SIZE if y_sort else pos[1] // self.chunk_pixels)
+        self.tiles.setdefault((z, y_sort), {}).setdefault(key, []).append((pos, surf))
+
+    def bake(self, groups):
+        # returns the new sprites
+        sprites = []
+        for (z, _), chunks in self.tiles.items():
+            for tiles in chunks.values():
+                rects = [surf.get_rect(topleft=pos) for pos, surf in tiles]
+                area = rects[0].unionall(rects[1:])
+                surf = pygame.Surface(area.size, pygame.SRCALPHA)
+                surf.blits([(tile_surf, rect.move(-area.x, -area.y)) for (_, tile_surf), rect in zip(tiles, rects)],
+                           False)
+                sprites.append(Generic(area.topleft, surf.convert_alpha(), groups, z))
+        self.tiles.clear()
+        return sprites
@@ -0,0 +1,165 @@
+import argparse
+import json
+import random
+import sys
+from time import perf_counter
+import numpy as np
+from settings import *
+from headless import HeadlessGame
+
+# the stages of Level.update / Level.draw that are reported on their own
+STAGES = ['world.update', 'all_sprites.update', 'customize_draw', 'plant_collision', 'rain.update', 'sky.display']
+
+
+def farm_tiles(level, amount):
+    # the farmable tiles first,then the free tiles closest to the farm
+    soil_layer = level.soil_layer
+    farmable = [(int(x), int(y)) for y, x in np.argwhere(soil_layer.grid & SOIL_FARMABLE)]
+    center_x = sum(x for x, _ in farmable) / len(farmable)
+    center_y = sum(y for _, y in farmable) / len(farmable)
+    collision = level.collision_sprites
+    rows, cols = soil_layer.grid.shape
+    free = [(x, y) for y in range(rows) for x in range(cols)
+            if not soil_layer.has_flag(x, y, SOIL_FARMABLE) and not collision.tiles[y * collision.cols + x]]
+    free.sort(key=lambda tile: (tile[0] - center_x) ** 2 + (tile[1] - center_y) ** 2)
+    return (farmable + free)[:amount], (center_x, center_y)
+
+
+# scenarios: name -> function that prepares a fresh level
+def empty_farm(level):
+    level.set_raining(False)
+
+
+def planted_farm(level, amount=500):
+    level.set_raining(False)
+    soil_layer = level.soil_layer
+    tiles, (center_x, center_y) = farm_tiles(level, amount)
+    level.player.seed_inventory['corn'] = amount
+    # only the soil around the player has sprites
+    level.player.place((center_x * TILE_SIZE, center_y * TILE_SIZE))
+    level.world.load_around(level.player.rect.center)
+    for x, y in tiles:
+        soil_layer.set_flag(x, y, SOIL_FARMABLE)
+        point = (x * TILE_SIZE + TILE_SIZE // 2, y * TILE_SIZE + TILE_SIZE // 2)
+        soil_layer.get_hit(point)
+        soil_layer.plant_seed(point, 'corn')
+
+
+def rain(level):
+    level.set_raining(True)
+
+
+def trees_chopped(level):
+    level.set_raining(False)
+    for tree in level.tree_sprites.sprites():
+        while tree.alive:
+            tree.damage()
+            tree.check_death()
+
+
+def shop_open(level):
+    level.set_raining(False)
+    level.toggle_shop()
+
+
+SCENARIOS = {
+    'empty farm': empty_farm,
+    '500 planted': planted_farm,
+    'rain': rain,
+    'trees chopped': trees_chopped,
+    'shop open': shop_open,
+}
+
+
+def percentile(values, percent):
+    return float(np.percentile(values, percent)) if values else 0.0
+
+
+def summary(values):
+    return {
+        'mean': float(np.mean(values)) if values else 0.0,
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+    }
+
+
+def run_scenario(name, frames, warmup):
+    # same seed for every run,so two runs build the same world
+    random.seed(0)
+    np.random.seed(0)
+    game = HeadlessGame(render=True)
+    level = game.level
+    SCENARIOS[name](level)
+    # settle the scene (sprites get indexed on the first draw)
+    for _ in range(warmup):
+        game.step()
+        level.profiler.end_frame()
+
+    frame_times = []
+    stage_times = {stage: [] for stage in STAGES}
+    for _ in range(frames):
+        start = perf_counter()
+        game.step()
+        frame_times.append((perf_counter() - start) * 1000)
+        stages = level.profiler.end_frame()
+        for stage in STAGES:
+            stage_times[stage].append(stages.get(stage, 0) * 1000)
+
+    result = {'frame': summary(frame_times)}
+    result.update({stage: summary(times) for stage, times in stage_times.items()})
+    result['sprites'] = len(level.all_sprites)
+    return result
+
+
+def compare(results, baseline, threshold):
+    # scenario names whose mean frame time got slower than the baseline by more than threshold
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['frame']['mean'], result['frame']['mean']
+        if after > before * (1 + threshold):
+            regressions.append((name, before, after))
+    return regressions
+
+
+def print_report(results):
+    print(f'{"scenario":<16}{"stage":<20}{"mean":>8}{"p95":>8}{"p99":>8}  (ms)')
+    for name, result in results.items():
+        for stage in ['frame'] + STAGES:
+            times = result[stage]
+            print(f'{name:<16}{stage:<20}{times["mean"]:>8.3f}{times["p95"]:>8.3f}{times["p99"]:>8.3f}')
+            name = ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='frame time benchmark of scripted, headless levels')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--warmup', type=int, default=30)
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS),
+                        help='run only this scenario,can be repeated')
+    parser.add_argument('--output', help='save the results as json')
+    parser.add_argument('--baseline', help='results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='allowed slowdown of the mean frame time,0.1 is 10%%')
+    args = parser.parse_args()
+
+    results = {name: run_scenario(name, args.frames, args.warmup) for name in args.scenario or SCENARIOS}
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'frames': args.frames, 'results': results}, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f'regression in {name}: {before:.3f} ms -> {after:.3f} ms')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+import pygame
+from bisect import insort
+from heapq import merge
+from settings import *
+from support import IndexedGroup, tiles_under
+
+
+def y_sort_key(sprite):
+    return sprite.rect.centery
+
+
+class CameraGroup(IndexedGroup):
+    def __init__(self, display_surface):
+        super().__init__()
+        self.display_surface = display_surface
+        self.offset = pygame.math.Vector2()
+        self.view = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.layer_order = sorted(LAYERS.values())
+
+        # spatial index: chunk (in tiles) -> z -> sprites overlapping that chunk.
+        # static sprites are inserted in centery order once,sprites with 'moving' set
+        # are kept apart,re-indexed when they cross a chunk border and re-sorted every frame.
+        self.chunk_pixels = CHUNK_SIZE * TILE_SIZE
+        self.chunks = {}
+        self.moving_chunks = {}
+        # placements: sprite -> (moving, z, chunk keys) of the place it is stored in
+        self.moving_sprites = set()
+
+        # z -> callbacks that add their own (surf, pos) pairs to the blit batch after the sprites of that layer,
+        # for things that are not sprites like the rain particles.
+        self.layer_renderers = {}
+
+        # player rect,hitbox and tool target,shown with the performance overlay
+        self.debug = False
+
+        # dirty rects: the blits of the last frame,to find the screen areas that changed since then
+        self.track_dirty = False
+        self.last_blits = set()
+        self.last_offset = None
+
+    def add_layer_renderer(self, z, renderer):
+        self.layer_renderers.setdefault(z, []).append(renderer)
+
+    def insert(self, sprite):
+        moving = getattr(sprite, 'moving', False)
+        keys = tiles_under(sprite.rect, self.chunk_pixels)
+        for key in keys:
+            if moving:
+                self.moving_chunks.setdefault(key, {}).setdefault(sprite.z, []).append(sprite)
+            else:
+                insort(self.chunks.setdefault(key, {}).setdefault(sprite.z, []), sprite, key=y_sort_key)
+        if moving:
+            self.moving_sprites.add(sprite)
+        self.placements[sprite] = (moving, sprite.z, keys)
+
+    def remove_from_index(self, sprite):
+        moving, z, keys = self.placements.pop(sprite)
+        chunks = self.moving_chunks if moving else self.chunks
+        for key in keys:
+            chunks[key][z].remove(sprite)
+        self.moving_sprites.discard(sprite)
+
+    def update_moving(self):
+        for sprite in self.moving_sprites.copy():
+            _, z, keys = self.placements[sprite]
+            if z != sprite.z or keys != tiles_under(sprite.rect, self.chunk_pixels):
+                self.refresh(sprite)
+
+    def visible_keys(self):
+        return tiles_under(self.view, self.chunk_pixels)
+
+    def interpolate(self, sprite, alpha):
+        # topleft between the previous and the current position of a moving sprite
+        previous_x, previous_y = sprite.previous_center
+        rect = sprite.rect
+        return (round(previous_x + (rect.centerx - previous_x) * alpha) - rect.width // 2,
+                round(previous_y + (rect.centery - previous_y) * alpha) - rect.height // 2)
+
+    def customize_draw(self, player, alpha=1):
+        self.flush_pending()
+        self.update_moving()
+        player_x, player_y = self.interpolate(player, alpha)
+        self.offset.x = player_x + player.rect.width // 2 - SCREEN_WIDTH / 2
+        self.offset.y = player_y + player.rect.height // 2 - SCREEN_HEIGHT / 2
+        offset_x, offset_y = int(self.offset.x), int(self.offset.y)
+        view = self.view
+        view.topleft = (offset_x, offset_y)
+
+        static_chunks = []
+        moving_chunks = []
+        for key in self.visible_keys():
+            if key in self.chunks:
+                static_chunks.append(self.chunks[key])
+            if key in self.moving_chunks:
+                moving_chunks.append(self.moving_chunks[key])
+
+        blit_sequence = []
+        drawn = set()
+        for layer in self.layer_order:
+            members = [chunk[layer] for chunk in static_chunks if chunk.get(layer)]
+            moving = [sprite for chunk in moving_chunks for sprite in chunk.get(layer, ())]
+            interpolated = {}
+            if moving:
+                moving.sort(key=y_sort_key)
+                members.append(moving)
+                interpolated = {sprite: self.interpolate(sprite, alpha)
+                                for sprite in moving if hasattr(sprite, 'previous_center')}
+            if members:
+                for sprite in members[0] if len(members) == 1 else merge(*members, key=y_sort_key):
+                    # sprites that overlap several chunks show up once per chunk
+                    if sprite in drawn:
+                        continue
+                    rect = sprite.rect
+                    if rect.colliderect(view):
+                        drawn.add(sprite)
+                        if sprite in interpolated:
+                            x, y = interpolated[sprite]
+                            blit_sequence.append((sprite.image, (x - offset_x, y - offset_y)))
+                        else:
+                            blit_sequence.append((sprite.image, (rect.x - offset_x, rect.y - offset_y)))
+            for renderer in self.layer_renderers.get(layer, ()):
+                renderer(blit_sequence, view, alpha)
+        self.display_surface.blits(blit_sequence, False)
+
+        # debug
+        if self.debug:
+            offset_rect = player.rect.copy()
+            offset_rect.topleft = (player_x - offset_x, player_y - offset_y)
+            pygame.draw.rect(self.display_surface, 'red', offset_rect, 5)
+            hitbox_rect = player.hitbox.copy()
+            hitbox_rect.center = offset_rect.center
+            pygame.draw.rect(self.display_surface, 'green', hitbox_rect, 5)
+            target_pos = offset_rect.center + PLAYER_TOOL_OFFSET[player.status.split('_')[0]]
+            pygame.draw.circle(self.display_surface, 'blue', target_pos, 5)
+
+        if self.track_dirty:
+            return self.changed_rects(blit_sequence, (offset_x, offset_y))
+        return None
+
+    def changed_rects(self, blit_sequence, offset):
+        # screen areas whose blits differ from the last frame,None when the whole screen changed.
+        # the changes are merged into one rect per block of the screen,so there are never more than a few.
+        blits = set(blit_sequence)
+        changes = blits.symmetric_difference(self.last_blits)
+        self.last_blits = blits
+        moved = offset != self.last_offset
+        self.last_offset = offset
+        if moved or self.debug:
+            return None
+
+        blocks = {}
+        for surf, pos in changes:
+            rect = surf.get_rect(topleft=pos)
+            key = (rect.centerx // DIRTY_RECT_BLOCK, rect.centery // DIRTY_RECT_BLOCK)
+            blocks[key] = blocks[key].union(rect) if key in blocks else rect
+        return list(blocks.values())
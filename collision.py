@@ -0,0 +1,46 @@
+import pygame
+from settings import *
+from support import IndexedGroup, tiles_under
+
+
+class CollisionGroup(IndexedGroup):
+    def __init__(self):
+        super().__init__()
+        # broad phase: uniform grid of TILE_SIZE cells -> sprites whose hitbox overlaps that cell
+        self.cells = {}
+        # placements: sprite -> cells it is stored in
+
+        # static collision tiles only need a flag per tile
+        self.cols, self.rows = 0, 0
+        self.tiles = bytearray()
+        tile_rect = pygame.Rect(0, 0, TILE_SIZE, TILE_SIZE)
+        # same hitbox the Collision layer tiles used to get as Generic sprites
+        self.tile_hitbox = tile_rect.inflate(-tile_rect.width * 0.2, -tile_rect.height * 0.75)
+
+    def create_tile_map(self, cols, rows, tiles):
+        self.cols, self.rows = cols, rows
+        self.tiles = bytearray(cols * rows)
+        for x, y in tiles:
+            self.tiles[y * cols + x] = 1
+
+    def insert(self, sprite):
+        # plants only get a hitbox once they grow
+        keys = tiles_under(sprite.hitbox) if hasattr(sprite, 'hitbox') else []
+        for key in keys:
+            self.cells.setdefault(key, []).append(sprite)
+        self.placements[sprite] = keys
+
+    def remove_from_index(self, sprite):
+        for key in self.placements.pop(sprite):
+            self.cells[key].remove(sprite)
+
+    def hitboxes(self, rect):
+        # every hitbox stored in the cells the rect covers
+        self.flush_pending()
+        found = {}
+        for x, y in tiles_under(rect):
+            if 0 <= x < self.cols and 0 <= y < self.rows and self.tiles[y * self.cols + x]:
+                found[(x, y)] = self.tile_hitbox.move(x * TILE_SIZE, y * TILE_SIZE)
+            for sprite in self.cells.get((x, y), ()):
+                found[sprite] = sprite.hitbox
+        return found.values()
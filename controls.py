@@ -0,0 +1,59 @@
+import pygame
+from settings import *
+
+
+class Controls:
+    def __init__(self, bindings=KEY_BINDINGS):
+        # action -> keys,key -> actions
+        self.bindings = {}
+        self.actions = {}
+        for action, keys in bindings.items():
+            self.bind(action, keys)
+
+        # keys that are down right now,for actions that last as long as a key is held (movement)
+        self.held = set()
+
+        # only the subscriber on top of the stack gets actions,e.g. the menu while the shop is open
+        self.subscribers = []
+        # action -> callbacks that get the action whoever is on top (debug overlay)
+        self.listeners = {}
+
+    def bind(self, action, keys):
+        # replaces the keys of an action
+        for key in self.bindings.get(action, []):
+            self.actions[key].remove(action)
+        self.bindings[action] = list(keys)
+        for key in keys:
+            self.actions.setdefault(key, []).append(action)
+
+    def push(self, subscriber):
+        self.subscribers.append(subscriber)
+
+    def pop(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+    def on(self, action, callback):
+        self.listeners.setdefault(action, []).append(callback)
+
+    def is_held(self, action):
+        return any(key in self.held for key in self.bindings.get(action, ()))
+
+    def dispatch(self, action):
+        for callback in self.listeners.get(action, ()):
+            callback()
+        if self.subscribers:
+            self.subscribers[-1].handle_action(action)
+
+    def process(self, events):
+        # called once per frame with the whole event queue,every press is seen even if it is shorter than a frame
+        for event in events:
+            if event.type == pygame.KEYDOWN:
+                self.held.add(event.key)
+                for action in self.actions.get(event.key, ()):
+                    self.dispatch(action)
+            elif event.type == pygame.KEYUP:
+                self.held.discard(event.key)
+            elif event.type == pygame.WINDOWFOCUSLOST:
+                # the key up events go to another window
+                self.held.clear()
@@ -0,0 +1,103 @@
+import numpy as np
+from settings import *
+
+PLANT_TYPES = list(GROW_SPEED)
+
+
+class CropEngine:
+    def __init__(self, max_ages, capacity=64):
+        # every plant of the farm,loaded or not,as one row in a set of arrays.the first 'count' rows are used,
+        # a removed plant is replaced by the last one.
+        # max_ages: plant type -> last frame index
+        self.max_ages = max_ages
+        self.count = 0
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.y = np.zeros(capacity, dtype=np.int32)
+        self.kind = np.zeros(capacity, dtype=np.uint8)  # index into PLANT_TYPES
+        self.age = np.zeros(capacity, dtype=np.float64)
+        self.speed = np.zeros(capacity, dtype=np.float64)
+        self.max_age = np.zeros(capacity, dtype=np.float64)
+        # the age changed since the sprite was last synced
+        self.dirty = np.zeros(capacity, dtype=bool)
+        self.rows = {}  # (x, y) -> row
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, tile):
+        return tile in self.rows
+
+    def reserve(self, capacity):
+        if capacity <= len(self.x):
+            return
+        capacity = max(capacity, len(self.x) * 2)
+        for name in ('x', 'y', 'kind', 'age', 'speed', 'max_age', 'dirty'):
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:self.count] = array[:self.count]
+            setattr(self, name, grown)
+
+    def add(self, x, y, plant_type, age=0):
+        self.reserve(self.count + 1)
+        row = self.count
+        self.x[row], self.y[row] = x, y
+        self.kind[row] = PLANT_TYPES.index(plant_type)
+        self.age[row] = age
+        self.speed[row] = GROW_SPEED[plant_type]
+        self.max_age[row] = self.max_ages[plant_type]
+        self.dirty[row] = False
+        self.rows[(x, y)] = row
+        self.count += 1
+
+    def remove(self, x, y):
+        row = self.rows.pop((x, y))
+        last = self.count - 1
+        if row != last:
+            for array in (self.x, self.y, self.kind, self.age, self.speed, self.max_age, self.dirty):
+                array[row] = array[last]
+            self.rows[(int(self.x[row]), int(self.y[row]))] = row
+        self.count = last
+
+    def clear(self):
+        self.count = 0
+        self.rows.clear()
+
+    def get(self, x, y):
+        # (plant_type, age) of the plant on a tile
+        row = self.rows[(x, y)]
+        return PLANT_TYPES[self.kind[row]], float(self.age[row])
+
+    def plants(self):
+        # (x, y, plant_type, age) of every plant
+        n = self.count
+        return [(x, y, PLANT_TYPES[kind], age) for x, y, kind, age in
+                zip(self.x[:n].tolist(), self.y[:n].tolist(), self.kind[:n].tolist(), self.age[:n].tolist())]
+
+    def grow(self, grid):
+        # one night: every plant on watered soil grows one step,all at once
+        n = self.count
+        if not n:
+            return
+        age = self.age[:n]
+        watered = (grid[self.y[:n], self.x[:n]] & SOIL_WATERED) != 0
+        grown = np.where(watered, np.minimum(age + self.speed[:n], self.max_age[:n]), age)
+        self.dirty[:n] |= grown != age
+        age[:] = grown
+
+    def fast_forward(self, grid, rain_days):
+        # several nights in a row,rain_days: whether it rains on each of the following days.
+        # the grid is changed like the nights would: the water dries up and comes back on rainy days.
+        tilled = (grid & SOIL_TILLED) != 0
+        for raining in rain_days:
+            self.grow(grid)
+            grid &= ~np.uint8(SOIL_WATERED)
+            if raining:
+                grid[tilled] |= SOIL_WATERED
+
+    def take_dirty(self, left, top, right, bottom):
+        # rows of the plants in the area (in tiles,right and bottom exclusive) whose sprites are out of date
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        rows = np.flatnonzero(self.dirty[:n] & (x >= left) & (x < right) & (y >= top) & (y < bottom))
+        self.dirty[rows] = False
+        return rows
@@ -0,0 +1,70 @@
+import os
+import pygame
+from settings import *
+from level import Level
+
+
+def init_headless():
+    # the dummy video driver never opens a window,but surfaces can still be converted once a mode is set.
+    # the mixer is left uninitialized,so every sound from the asset registry is silent.
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.display.init()
+    pygame.font.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((1, 1))
+
+
+class HeadlessGame:
+    def __init__(self, render=False, tick_rate=TICK_RATE):
+        init_headless()
+
+        # rendering goes to an offscreen surface,when it is enabled at all
+        self.surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.level = Level(self.surface)
+        self.render = render
+        self.step_time = 1 / tick_rate
+
+        # keys held by the script,changes become key events
+        self.keys = set()
+
+    def key_events(self, keys):
+        keys = set(keys)
+        events = [pygame.event.Event(pygame.KEYUP, key=key) for key in self.keys - keys]
+        events += [pygame.event.Event(pygame.KEYDOWN, key=key) for key in keys - self.keys]
+        self.keys = keys
+        return events
+
+    def step(self, keys=()):
+        # keys: the keys held during this step,a key that stays held is pressed only once
+        self.level.controls.process(self.key_events(keys))
+        self.level.update(self.step_time)
+        if self.render:
+            self.level.draw()
+
+    def run(self, steps, keys=()):
+        for _ in range(steps):
+            self.step(keys)
+
+    def tap(self, key):
+        # press and release within one step
+        self.step(self.keys | {key})
+        self.step(self.keys - {key})
+
+    def run_script(self, script):
+        # script: [(steps, keys), ...] e.g. [(60, [pygame.K_d]), (1, [pygame.K_SPACE])]
+        for steps, keys in script:
+            self.run(steps, keys)
+
+    def sleep(self):
+        # go to bed and step through the transition,the level resets halfway
+        self.level.player.sleep = True
+        while self.level.player.sleep:
+            self.step()
+
+    def run_days(self, days):
+        for _ in range(days):
+            self.sleep()
+
+    def skip_days(self, days):
+        # the days pass without stepping through them
+        self.level.fast_forward(days)
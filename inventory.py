@@ -0,0 +1,24 @@
+class Inventory(dict):
+    # a dict that tells its listeners about every change,so the menu and the hud only redraw when they have to
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.listeners = []
+
+    def subscribe(self, callback):
+        # callback(key, value)
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def __setitem__(self, key, value):
+        if key in self and self[key] == value:
+            return
+        super().__setitem__(key, value)
+        for callback in self.listeners:
+            callback(key, value)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
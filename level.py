@@ -1,109 +1,122 @@
+import os
+import struct
+import threading
 import pygame
 from settings import *
 from player import Player
-from overlay import Overlay
-from sprites import Generic, Water, WildFlower, Tree, Interaction, Partical
-from pytmx.util_pygame import load_pygame
-from support import import_folder
+from overlay import Overlay, PerfOverlay
+from sprites import Interaction, Partical
+from tilemap import load_map
 from transition import Transition
 from soil import SoilLayer
 from sky import Rain, Sky
 from random import randint
 from menu import Menu
+from camera import CameraGroup
+from timer import game_clock
+from profiler import Profiler
+from streaming import WorldStreamer
+from occupancy import OccupancyMap
+from collision import CollisionGroup
+from controls import Controls
+from save import dumps, write, load_game
+from sounds import sounds, music
+
+
+def add_rects(changed, rects):
+    # None stands for the whole screen
+    if changed is None or rects is None:
+        return None
+    return changed + rects
 
 
 class Level:
-    def __init__(self):
-        # get_surface() comes from main.Game.__init__():pygame.display.setmode
-        self.display_surface = pygame.display.get_surface()
+    def __init__(self, display_surface=None, save_file=None):
+        # get_surface() comes from main.Game.__init__():pygame.display.setmode,
+        # headless runs pass an offscreen surface instead.
+        self.display_surface = pygame.display.get_surface() if display_surface is None else display_surface
+
+        # time spent in each stage of update() and draw()
+        self.profiler = Profiler()
+
+        # timers and lifetimes left over from an earlier level
+        game_clock.clear()
+
+        # key presses become actions for the player,or for the menu while the shop is open
+        self.controls = Controls()
+        self.controls.on('toggle debug', self.toggle_debug)
 
         # sprite groups
-        self.all_sprites = CameraGroup()
-        self.collision_sprites = pygame.sprite.Group()
+        self.all_sprites = CameraGroup(self.display_surface)
+        self.all_sprites.track_dirty = DIRTY_RECTS
+        self.full_update = True
+        self.collision_sprites = CollisionGroup()
         self.tree_sprites = pygame.sprite.Group()
         self.interaction_sprites = pygame.sprite.Group()
 
-        self.soil_layer = SoilLayer(self.all_sprites, self.collision_sprites)
+        # the map is parsed once and shared with the soil layer and the rain
+        self.map_data = load_map()
+
+        # soil,water,plants and trees by tile
+        self.occupancy = OccupancyMap()
+        self.soil_layer = SoilLayer(self.all_sprites, self.collision_sprites, self.map_data, self.occupancy)
         self.setup()
-        self.overlay = Overlay(self.player)
-        self.transition = Transition(self.reset, self.player)
+        self.sky = Sky(self.display_surface)
+        self.overlay = Overlay(self.player, self.sky, self.display_surface)
+        self.perf_overlay = PerfOverlay(self, self.display_surface)
+        self.transition = Transition(self.reset, self.player, self.display_surface)
 
         # sky
-        self.rain = Rain(self.all_sprites)
-        self.raining = randint(0, 10) > 5
-        self.soil_layer.raining = self.raining  # tell soil_layer if it is raining.
-        self.sky = Sky()
+        self.rain = Rain(self.all_sprites, self.map_data.size)
+        self.set_raining(randint(0, 10) > 5)
 
         # shop
         self.shop_active = False
-        self.menu = Menu(self.player, self.toggle_shop)
+        self.menu = Menu(self.player, self.toggle_shop, self.display_surface)
 
-        # music
-        self.success = pygame.mixer.Sound('./audio/success.wav')
-        self.success.set_volume(0.1)
-        self.bgm = pygame.mixer.Sound('./audio/bg.mp3')
-        self.bgm.set_volume(0.3)
-        self.bgm.play()
+        # music,picked by the weather and the time of day in update().
+        # effects still playing from an earlier level are cut off as well
+        music.stop()
+        sounds.stop()
+
+        # save,the game goes on from the last morning if there is one
+        self.save_file = save_file
+        self.save_thread = None
+        if save_file and os.path.exists(save_file):
+            try:
+                load_game(self, save_file)
+            except (ValueError, struct.error):
+                # a broken or old save is put aside and the game starts on a new farm
+                os.replace(save_file, save_file + '.bad')
 
     def setup(self):
-        tmx_data = load_pygame('./data/map.tmx')
-        # house
-        for layers in ['HouseFloor', 'HouseFurnitureBottom']:
-            for x, y, surf in tmx_data.get_layer_by_name(layers).tiles():
-                Generic((x * TILE_SIZE, y * TILE_SIZE), surf, self.all_sprites, LAYERS['house bottom'])
-        for layers in ['HouseWalls', 'HouseFurnitureTop']:
-            for x, y, surf in tmx_data.get_layer_by_name(layers).tiles():
-                Generic((x * TILE_SIZE, y * TILE_SIZE), surf, self.all_sprites)
-        # Fence
-        for layers in ['Fence']:
-            for x, y, surf in tmx_data.get_layer_by_name(layers).tiles():
-                Generic((x * TILE_SIZE, y * TILE_SIZE), surf, [self.all_sprites, self.collision_sprites])
-
-        # water
-        water_frames = import_folder('./graphics/water')
-        for x, y, surf in tmx_data.get_layer_by_name('Water').tiles():
-            Water((x * TILE_SIZE, y * TILE_SIZE), water_frames, self.all_sprites)
-
-        # trees
-        for obj in tmx_data.get_layer_by_name('Trees'):
-            # make sure 'self.all_sprites' is the first Sprite in the array.It's related to
-            # sprites.Tree.damage#remove an apple
-            Tree(
-                pos=(obj.x, obj.y),
-                surf=obj.image,
-                groups=[self.all_sprites, self.collision_sprites, self.tree_sprites],
-                name=obj.name,
-                player_add=self.player_add
-            )
-
-        # wildflowers
-        for obj in tmx_data.get_layer_by_name('Decoration'):
-            WildFlower((obj.x, obj.y), obj.image, [self.all_sprites, self.collision_sprites])
+        map_data = self.map_data
+        # tiles,trees and decoration are made chunk by chunk around the player
+        self.world = WorldStreamer(map_data, self.all_sprites, self.collision_sprites, self.tree_sprites,
+                                   self.soil_layer, self.occupancy, self.player_add)
 
         # collision tiles
-        for x, y, surf in tmx_data.get_layer_by_name('Collision').tiles():
-            Generic(pos=(x * TILE_SIZE, y * TILE_SIZE), surf=pygame.Surface((TILE_SIZE, TILE_SIZE)),
-                    groups=self.collision_sprites)
-
-        Generic(
-            pos=(0, 0),
-            surf=pygame.image.load('./graphics/world/ground.png').convert_alpha(),
-            groups=self.all_sprites,
-            z=LAYERS['ground']
+        self.collision_sprites.create_tile_map(
+            map_data.cols, map_data.rows,
+            [(x, y) for x, y, _ in map_data.tiles('Collision')]
         )
+
         # Player setup
-        for obj in tmx_data.get_layer_by_name('Player'):
+        for obj in map_data.objects('Player'):
             # set position when level start
             if obj.name == 'Start':
                 self.player = Player(
                     pos=(obj.x, obj.y),
                     group=self.all_sprites,
                     collison_sprites=self.collision_sprites,
-                    tree_sprites=self.tree_sprites,
+                    occupancy=self.occupancy,
                     interaction_sprites=self.interaction_sprites,
                     soil_layer=self.soil_layer,
-                    toggle_shop=self.toggle_shop
+                    toggle_shop=self.toggle_shop,
+                    controls=self.controls
                 )
+                self.controls.push(self.player)
+                self.world.load_around(self.player.rect.center)
             # init bed interaction area
             if obj.name == 'Bed':
                 Interaction((obj.x, obj.y), (obj.width, obj.height), self.interaction_sprites, obj.name)
@@ -113,86 +126,132 @@ class Level:
 
     def player_add(self, item):
         self.player.item_inventory[item] += 1
-        self.success.play()
+        sounds.play('success')
 
     def toggle_shop(self):
         self.shop_active = not self.shop_active
+        if self.shop_active:
+            self.controls.push(self.menu)
+        else:
+            self.controls.pop(self.menu)
+        self.full_update = True
+
+    def toggle_debug(self):
+        self.perf_overlay.toggle()
+        self.all_sprites.debug = self.perf_overlay.visible
+        self.full_update = True
 
     def reset(self):
-        # plants
-        self.soil_layer.update_plants()
-
-        # soil
-        self.soil_layer.remove_water()
-        self.raining = randint(0, 10) > 5
-        self.soil_layer.raining = self.raining
-        if self.raining:
-            self.soil_layer.water_all()
-
-        # apples on the tree
-        for tree in self.tree_sprites.sprites():
-            for apple in tree.apple_sprites.sprites():
-                apple.kill()
-            tree.create_fruit()
+        # plants,soil and apples
+        self.fast_forward(1)
 
         # sky
         self.sky.start_color = [255, 255, 255]
 
+        # a new day
+        self.autosave()
+
+    def fast_forward(self, days):
+        # let days go by at once,e.g. for long simulations.the weather is rolled for every day
+        if days <= 0:
+            return
+        rain_days = [randint(0, 10) > 5 for _ in range(days)]
+        self.soil_layer.fast_forward(rain_days)
+        self.set_raining(rain_days[-1])
+        self.world.regrow_fruit()
+
+    def set_raining(self, raining):
+        self.raining = raining
+        self.soil_layer.raining = raining  # tell soil_layer if it is raining.
+        self.rain.raining = raining
+
+    def autosave(self):
+        if not self.save_file:
+            return
+        # the snapshot is taken here,only the file is written in the background
+        data = dumps(self)
+        self.finish_saving()
+        self.save_thread = threading.Thread(target=write, args=(self.save_file, data), daemon=True)
+        self.save_thread.start()
+
+    def finish_saving(self):
+        if self.save_thread:
+            self.save_thread.join()
+            self.save_thread = None
+
     def plant_collision(self):
-        if self.soil_layer.plant_sprites:
-            for plant in self.soil_layer.plant_sprites.sprites():
+        # only the plants on the tiles under the player,a plant image reaches at most a tile above its own
+        area = self.player.hitbox.copy()
+        area.height += TILE_SIZE
+        if self.soil_layer.plants:
+            for plant in self.occupancy.find('plant', area):
                 if plant.harvestable and plant.rect.colliderect(self.player.hitbox):
                     self.player_add(plant.plant_type)
                     plant.kill()
                     Partical(plant.rect.topleft, plant.image, self.all_sprites, LAYERS['main'])
-                    self.soil_layer.grid[plant.rect.centery // TILE_SIZE][plant.rect.centerx // TILE_SIZE].remove('P')
+                    self.soil_layer.remove_plant(plant)
 
-    def run(self, dt):
+    def update(self, dt):
+        # one simulation step,dt is fixed when called from main.Game.run
+        profiler = self.profiler
+        # the game stops while the shop is open: timers,world,sprites and rain
+        if not self.shop_active:
+            game_clock.update(dt)
+            with profiler.stage('world.update'):
+                self.world.update(self.player.rect.center)
+                # plants grow overnight,their sprites catch up once they are on screen
+                view = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT).inflate(TILE_SIZE * 2, TILE_SIZE * 2)
+                view.center = self.player.rect.center
+                self.soil_layer.sync_plants(view)
+            with profiler.stage('all_sprites.update'):
+                self.all_sprites.update(dt)
+            with profiler.stage('plant_collision'):
+                self.plant_collision()
+            with profiler.stage('rain.update'):
+                self.rain.update(dt)
 
-        # drawing logic
-        self.display_surface.fill('black')
-        self.all_sprites.customize_draw(self.player)
+        # weather
+        self.sky.update(dt)  # daytime
+        music.update(self.raining, self.sky.day_progress())
+
+        # transition overlay
+        if self.player.sleep:
+            with profiler.stage('transition'):
+                self.transition.update(dt)
 
-        # updates
-        # stop the game when the menu is open
+    def draw(self, alpha=1):
+        # alpha: how far we are between the last two simulation steps,used to interpolate moving things.
+        # returns the screen rects that changed since the last frame,None when the whole screen did.
+        profiler = self.profiler
+        # the world doesn't step while the shop is open,so there is nothing to interpolate
         if self.shop_active:
-            self.menu.upate()
-        else:
-            self.all_sprites.update(dt)
-            self.plant_collision()
+            alpha = 1
+        self.display_surface.fill('black')
+        with profiler.stage('customize_draw'):
+            changed = self.all_sprites.customize_draw(self.player, alpha)
+        if self.shop_active:
+            with profiler.stage('menu'):
+                changed = add_rects(changed, self.menu.display())
 
-        # weather
-        self.overlay.display()
-        if self.raining and not self.shop_active:  # rain
-            self.rain.update()
-        self.sky.display(dt)  # daytime
+        with profiler.stage('overlay'):
+            changed = add_rects(changed, self.overlay.display())
+        with profiler.stage('sky.display'):
+            changed = add_rects(changed, self.sky.display())
 
-        # transition overlay
         if self.player.sleep:
-            self.transition.play()
-
-
-class CameraGroup(pygame.sprite.Group):
-    def __init__(self):
-        super().__init__()
-        self.display_surface = pygame.display.get_surface()
-        self.offset = pygame.math.Vector2()
-
-    def customize_draw(self, player):
-        self.offset.x = player.rect.centerx - SCREEN_WIDTH / 2
-        self.offset.y = player.rect.centery - SCREEN_HEIGHT / 2
-        for layer in LAYERS.values():
-            for sprite in sorted(self.sprites(), key=lambda s: s.rect.centery):
-                if sprite.z == layer:
-                    offset_rect = sprite.rect.copy()
-                    offset_rect.center -= self.offset
-                    self.display_surface.blit(sprite.image, offset_rect)
-
-                    # debug
-                    if sprite == player:
-                        pygame.draw.rect(self.display_surface, 'red', offset_rect, 5)
-                        hitbox_rect = player.hitbox.copy()
-                        hitbox_rect.center = offset_rect.center
-                        pygame.draw.rect(self.display_surface, 'green', hitbox_rect, 5)
-                        target_pos = offset_rect.center + PLAYER_TOOL_OFFSET[player.status.split('_')[0]]
-                        pygame.draw.circle(self.display_surface, 'blue', target_pos, 5)
+            with profiler.stage('transition'):
+                changed = add_rects(changed, self.transition.display())
+
+        # on top of everything and not part of the measured stages
+        changed = add_rects(changed, self.perf_overlay.display())
+
+        # the menu or the performance overlay was opened or closed
+        if self.full_update:
+            self.full_update = False
+            return None
+        return changed
+
+    def run(self, dt):
+        # a single step followed by a frame
+        self.update(dt)
+        self.draw()
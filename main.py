@@ -1,29 +1,86 @@
 import pygame,sys
 from settings import *
 from level import Level
+from support import assets
+from tilemap import load_map
 
 
 class Game:
     def __init__(self):
         pygame.init()
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH,SCREEN_HEIGHT))
+        # vsync needs a renderer,which pygame only sets up for scaled or opengl windows
+        flags = pygame.SCALED if VSYNC else 0
+        self.screen = pygame.display.set_mode((SCREEN_WIDTH,SCREEN_HEIGHT), flags, vsync=VSYNC)
         pygame.display.set_caption(GAME_NAME)
         self.clock = pygame.time.Clock()
-        self.level = Level()
+        self.load_assets()
+        self.level = Level(save_file=SAVE_FILE)
+
+    def show_progress(self, text, progress):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+        font = assets.font('./font/LycheeSoda.ttf', 30)
+        bar = pygame.Rect(0, 0, SCREEN_WIDTH / 2, 20)
+        bar.center = (SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 30)
+        self.screen.fill('black')
+        text_surf = font.render(text, False, 'White')
+        self.screen.blit(text_surf, text_surf.get_rect(midbottom=(SCREEN_WIDTH / 2, bar.top - 10)))
+        pygame.draw.rect(self.screen, 'White', bar, 2, 4)
+        pygame.draw.rect(self.screen, 'White', (bar.left, bar.top, bar.width * progress, bar.height), 0, 4)
+        pygame.display.update()
+
+    def load_assets(self):
+        # the window shows progress while the files are decoded in the background,
+        # the map (tilesets are converted by pytmx) is the last step.
+        self.show_progress('loading', 0)
+        loading = assets.preload(PRELOAD_FOLDERS, PRELOAD_FOLDER_DICTS, PRELOAD_IMAGES, PRELOAD_SOUNDS, ASSET_WORKERS)
+        done, total = 0, 0
+        last_shown = pygame.time.get_ticks()
+        for done, total in loading:
+            # redrawing the screen for every file would cost more than the decoding
+            if pygame.time.get_ticks() - last_shown > 30:
+                last_shown = pygame.time.get_ticks()
+                self.show_progress('loading', done / (total + 1))
+        self.show_progress('loading map', total / (total + 1))
+        load_map()
+        self.show_progress('loading map', 1)
 
     def run(self):
+        # fixed timestep: the simulation always moves in steps of 'step' seconds,
+        # rendering happens once per frame and interpolates between the last two steps.
+        step = 1 / TICK_RATE
+        accumulator = 0
         while True:
-            for event in pygame.event.get():
+            events = pygame.event.get()
+            for event in events:
                 if event.type == pygame.QUIT:
+                    self.level.finish_saving()
                     pygame.quit()
                     sys.exit()
-            # dt is does matter.
-            dt = self.clock.tick(180) / 1000
-            self.level.run(dt)
-            pygame.display.update()
+            # key presses are handled before the steps of this frame
+            self.level.controls.process(events)
+            # with vsync the display already limits the frame rate
+            accumulator += self.clock.tick(0 if VSYNC else FRAME_RATE_CAP) / 1000
+
+            steps = 0
+            while accumulator >= step and steps < MAX_CATCHUP_STEPS:
+                self.level.update(step)
+                accumulator -= step
+                steps += 1
+            # too slow to catch up,drop the backlog instead of spiralling
+            if steps == MAX_CATCHUP_STEPS:
+                accumulator = min(accumulator, step)
+
+            changed = self.level.draw(accumulator / step)
+            if DIRTY_RECTS and changed is not None:
+                pygame.display.update(changed)
+            else:
+                pygame.display.update()
+            self.level.profiler.end_frame()
 
 
 if __name__ == '__main__':
     game = Game()
     game.run()
-
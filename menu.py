@@ -1,29 +1,37 @@
 import pygame
 from settings import *
-from timer import Timer
+from support import assets
 
 
 class Menu:
-    def __init__(self, player, toggle_menu):
+    def __init__(self, player, toggle_menu, display_surface):
         # general setup
         self.player = player
         self.toggle_menu = toggle_menu
-        self.display_surface = pygame.display.get_surface()
-        self.font = pygame.font.Font('./font/LycheeSoda.ttf', 30)
+        self.display_surface = display_surface
+        self.font = assets.font('./font/LycheeSoda.ttf', 30)
 
         # options
         self.width = 400
         self.space = 10
         self.padding = 8
 
-        # entries
-        self.options = list(self.player.item_inventory.keys()) + list(self.player.seed_inventory.keys())
+        # entries: (name,inventory the amount comes from),the items are sold and the seeds are bought
+        self.entries = [(item, self.player.item_inventory) for item in self.player.item_inventory] + \
+                       [(seed, self.player.seed_inventory) for seed in self.player.seed_inventory]
+        self.options = [name for name, _ in self.entries]
         self.sell_border = len(self.player.item_inventory) - 1
         self.setup()
 
         # movement
         self.index = 0
-        self.timer = Timer(200)
+
+        # the menu is drawn into cached surfaces,which are redrawn only after something changed
+        self.dirty = True
+        self.money_rect = None
+        self.player.item_inventory.subscribe(self.mark_dirty)
+        self.player.seed_inventory.subscribe(self.mark_dirty)
+        self.player.wallet.subscribe(self.mark_dirty)
 
     def setup(self):
         # create the text surfaces
@@ -36,77 +44,92 @@ class Menu:
         self.total_height += (len(self.text_surfs) - 1) * self.space
         self.menu_top = SCREEN_HEIGHT / 2 - self.total_height / 2
         self.main_rect = pygame.Rect(SCREEN_WIDTH / 2 - self.width / 2, self.menu_top, self.width, self.total_height)
+        self.menu_surf = pygame.Surface(self.main_rect.size, pygame.SRCALPHA)
         # buy / sell text surface
         self.buy_text = self.font.render('buy', False, 'Black')
         self.sell_text = self.font.render('sell', False, 'Black')
 
-    def display_money(self):
+    def mark_dirty(self, *args):
+        self.dirty = True
+
+    def redraw_money(self):
         text_surf = self.font.render(f'${self.player.money}', False, 'Black')
-        text_rect = text_surf.get_rect(midbottom=(SCREEN_WIDTH / 2, SCREEN_HEIGHT - 20))
-        pygame.draw.rect(self.display_surface, 'White', text_rect.inflate(10, 10), 0, 6)  # radio
-        self.display_surface.blit(text_surf, text_rect)
-
-    def input(self):
-        keys = pygame.key.get_pressed()
-        self.timer.update()
-        if keys[pygame.K_ESCAPE]:
+        self.money_rect = text_surf.get_rect(midbottom=(SCREEN_WIDTH / 2, SCREEN_HEIGHT - 20)).inflate(10, 10)
+        self.money_surf = pygame.Surface(self.money_rect.size, pygame.SRCALPHA)
+        pygame.draw.rect(self.money_surf, 'White', self.money_surf.get_rect(), 0, 6)  # radio
+        self.money_surf.blit(text_surf, text_surf.get_rect(center=self.money_surf.get_rect().center))
+
+    def redraw(self):
+        self.menu_surf.fill((0, 0, 0, 0))
+        top = 0
+        for index, (text_surf, (name, inventory)) in enumerate(zip(self.text_surfs, self.entries)):
+            self.show_entry(text_surf, inventory[name], top, self.index == index)
+            top += text_surf.get_height() + (self.padding * 2) + self.space
+        self.redraw_money()
+        self.dirty = False
+
+    def handle_action(self, action):
+        # one call per key press while the shop is open,from Controls
+        if action == 'close menu':
             self.toggle_menu()
-        if not self.timer.active:
-            if keys[pygame.K_UP]:
-                self.index -= 1
-                self.timer.activate()
-            if keys[pygame.K_DOWN]:
-                self.index += 1
-                self.timer.activate()
-            if keys[pygame.K_SPACE]:
-                self.timer.activate()
-                # get item
-                current_item = self.options[self.index]
-                # sell
-                if self.index <= self.sell_border:
-                    if self.player.item_inventory[current_item] > 0:
-                        self.player.item_inventory[current_item] -= 1
-                        self.player.money += SALE_PRICES[current_item]
-                # buy
-                elif self.index > self.sell_border:
-                    if self.player.money - PURCHASE_PRICES[current_item] >= 0:
-                        self.player.money -= PURCHASE_PRICES[current_item]
-                        self.player.item_inventory[current_item] += 1
+        elif action == 'menu up':
+            self.index -= 1
+            self.dirty = True
+        elif action == 'menu down':
+            self.index += 1
+            self.dirty = True
+        elif action == 'trade':
+            # get item
+            current_item = self.options[self.index]
+            # sell
+            if self.index <= self.sell_border:
+                if self.player.item_inventory[current_item] > 0:
+                    self.player.item_inventory[current_item] -= 1
+                    self.player.money += SALE_PRICES[current_item]
+            # buy
+            elif self.index > self.sell_border:
+                if self.player.money - PURCHASE_PRICES[current_item] >= 0:
+                    self.player.money -= PURCHASE_PRICES[current_item]
+                    self.player.seed_inventory[current_item] += 1
 
         # clamo the values
         if self.index < 0:
             self.index = len(self.options) - 1
-        elif self.index > len(self.options):
+        elif self.index >= len(self.options):
             self.index = 0
 
     def show_entry(self, text_surf, amount, top, selected):
+        # draws into the cached menu surface,positions are relative to main_rect
         # background
-        bg_rect = pygame.Rect(self.main_rect.left, top, self.width, text_surf.get_height() + (self.padding * 2))
-        pygame.draw.rect(self.display_surface, 'White', bg_rect, 0, 4)
+        bg_rect = pygame.Rect(0, top, self.width, text_surf.get_height() + (self.padding * 2))
+        pygame.draw.rect(self.menu_surf, 'White', bg_rect, 0, 4)
 
         # text
-        text_rect = text_surf.get_rect(midleft=(self.main_rect.left + 20, bg_rect.centery))
-        self.display_surface.blit(text_surf, text_rect)
+        text_rect = text_surf.get_rect(midleft=(20, bg_rect.centery))
+        self.menu_surf.blit(text_surf, text_rect)
 
         # amount
         amount_surf = self.font.render(str(amount), False, 'Black')
-        amount_rect = amount_surf.get_rect(midright=(self.main_rect.right - 20, bg_rect.centery))
-        self.display_surface.blit(amount_surf, amount_rect)
+        amount_rect = amount_surf.get_rect(midright=(self.width - 20, bg_rect.centery))
+        self.menu_surf.blit(amount_surf, amount_rect)
 
         # selected
         if selected:
-            pygame.draw.rect(self.display_surface, 'black', bg_rect, 4, 4)  # draw a border
-            pos_rect = self.sell_text.get_rect(midleft=(self.main_rect.left + 150, bg_rect.centery))
+            pygame.draw.rect(self.menu_surf, 'black', bg_rect, 4, 4)  # draw a border
+            pos_rect = self.sell_text.get_rect(midleft=(150, bg_rect.centery))
             if self.index <= self.sell_border:  # sell
-                self.display_surface.blit(self.sell_text, pos_rect)
+                self.menu_surf.blit(self.sell_text, pos_rect)
             else:  # buy
-                self.display_surface.blit(self.buy_text, pos_rect)
-
-    def upate(self):
-        self.input()
-        self.display_money()
-        for index, text_surf in enumerate(self.text_surfs):
-            top = self.main_rect.top + index * (text_surf.get_height() + (self.padding * 2) + self.space)
-            amount_list = list(self.player.item_inventory.values()) + list(self.player.seed_inventory.values())
-            amount = amount_list[index]
-            self.show_entry(text_surf, amount, top, self.index == index)
+                self.menu_surf.blit(self.buy_text, pos_rect)
+
+    def display(self):
+        # returns the screen rects that changed since the last frame
+        changed = []
+        if self.dirty:
+            if self.money_rect:
+                changed.append(self.money_rect)
+            self.redraw()
+            changed += [self.money_rect, self.main_rect]
+        self.display_surface.blit(self.money_surf, self.money_rect)
+        self.display_surface.blit(self.menu_surf, self.main_rect)
+        return changed
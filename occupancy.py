@@ -0,0 +1,47 @@
+from support import tile_of, tiles_under
+
+
+class OccupancyMap:
+    def __init__(self):
+        # what is on a tile,so tools and harvesting don't have to search whole sprite groups.
+        # kind -> {(col, row): entity} for things that take one tile (soil,water,plant)
+        self.layers = {}
+        # kind -> {(col, row): [entity, ...]} for things that can be bigger (tree)
+        self.areas = {}
+        # entity -> tiles it was placed on
+        self.placements = {}
+
+    def layer(self, kind):
+        # the dict can be filled directly,see SoilLayer
+        return self.layers.setdefault(kind, {})
+
+    def get(self, kind, pos):
+        # the one entity of a kind on the tile of a pixel position
+        return self.layer(kind).get(tile_of(pos))
+
+    def place(self, kind, rect, entity):
+        # a larger entity is stored on every tile its rect covers
+        keys = tiles_under(rect)
+        cells = self.areas.setdefault(kind, {})
+        for key in keys:
+            cells.setdefault(key, []).append(entity)
+        self.placements[entity] = keys
+
+    def remove(self, kind, entity):
+        cells = self.areas[kind]
+        for key in self.placements.pop(entity):
+            cells[key].remove(entity)
+            if not cells[key]:
+                del cells[key]
+
+    def find(self, kind, rect):
+        # every entity of a kind on the tiles under a rect
+        layer = self.layers.get(kind, {})
+        cells = self.areas.get(kind, {})
+        found = {}
+        for key in tiles_under(rect):
+            if key in layer:
+                found[layer[key]] = True
+            for entity in cells.get(key, ()):
+                found[entity] = True
+        return list(found)
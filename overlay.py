@@ -1,29 +1,153 @@
 import pygame
 from settings import *
+from support import assets
 
 
 class Overlay:
-    def __init__(self, player):
+    def __init__(self, player, sky, display_surface):
         # general setup
-        self.display_surface = pygame.display.get_surface()
+        self.display_surface = display_surface
         self.player = player
+        self.sky = sky
+        self.font = assets.font('./font/LycheeSoda.ttf', 30)
+        self.small_font = assets.font('./font/LycheeSoda.ttf', 20)
 
         # imports
         overlay_path = 'graphics/overlay/'
-        self.tools_surf = {tool: pygame.image.load(f'{overlay_path}{tool}.png').convert_alpha() for tool in
-                           player.tools}
-        self.seeds_surf = {seed: pygame.image.load(f'{overlay_path}{seed}.png').convert_alpha() for seed in
-                           player.seeds}
+        self.tools_surf = {tool: assets.image(f'{overlay_path}{tool}.png') for tool in player.tools}
+        self.seeds_surf = {seed: assets.image(f'{overlay_path}{seed}.png') for seed in player.seeds}
 
-    def display(self):
-        # tool
-        tool_surf = self.tools_surf[self.player.selected_tool]
-        tool_surf = pygame.transform.scale(tool_surf,(tool_surf.get_size()[0],tool_surf.get_size()[1]))
-        tool_rect = tool_surf.get_rect(midbottom=OVERLAY_POSITIONS['tool'])
-        self.display_surface.blit(tool_surf, tool_rect)
+        # every hud element is composited into one cached surface,which is rebuilt only when one of them changes.
+        # the selected tool,seed and the clock are compared every frame,seeds and money tell us when they change.
+        self.surf = None
+        self.rect = None
+        self.state = None
+        self.dirty = True
+        self.player.seed_inventory.subscribe(self.mark_dirty)
+        self.player.wallet.subscribe(self.mark_dirty)
+
+    def mark_dirty(self, *args):
+        self.dirty = True
+
+    def clock_minutes(self):
+        # the sky only knows how far the day is,shown in steps of 10 minutes
+        start, end = DAY_HOURS
+        return int((start + (end - start) * self.sky.day_progress()) * 60) // 10 * 10
+
+    def label(self, text, font):
+        # text on a white rounded box,like the money in the shop
+        text_surf = font.render(text, False, 'Black')
+        surf = pygame.Surface(text_surf.get_rect().inflate(10, 10).size, pygame.SRCALPHA)
+        pygame.draw.rect(surf, 'White', surf.get_rect(), 0, 6)
+        surf.blit(text_surf, text_surf.get_rect(center=surf.get_rect().center))
+        return surf
 
-        # seed
+    def elements(self, minutes):
+        # (surface,rect in screen coordinates) of every hud element
+        tool_surf = self.tools_surf[self.player.selected_tool]
         seed_surf = self.seeds_surf[self.player.selected_seed]
-        seed_surf = pygame.transform.scale(seed_surf,(seed_surf.get_size()[0],seed_surf.get_size()[1]))
         seed_rect = seed_surf.get_rect(midbottom=OVERLAY_POSITIONS['seed'])
-        self.display_surface.blit(seed_surf, seed_rect)
+        count_surf = self.label(str(self.player.seed_inventory[self.player.selected_seed]), self.small_font)
+        clock_surf = self.label(f'{minutes // 60:02d}:{minutes % 60:02d}', self.font)
+        money_surf = self.label(f'${self.player.money}', self.font)
+        return [
+            (tool_surf, tool_surf.get_rect(midbottom=OVERLAY_POSITIONS['tool'])),
+            (seed_surf, seed_rect),
+            (count_surf, count_surf.get_rect(center=seed_rect.bottomright)),
+            (clock_surf, clock_surf.get_rect(midleft=OVERLAY_POSITIONS['clock'])),
+            (money_surf, money_surf.get_rect(midleft=OVERLAY_POSITIONS['money'])),
+        ]
+
+    def redraw(self, minutes):
+        elements = self.elements(minutes)
+        rect = elements[0][1].unionall([element_rect for _, element_rect in elements])
+        if self.surf is None or self.surf.get_size() != rect.size:
+            self.surf = pygame.Surface(rect.size, pygame.SRCALPHA)
+        self.surf.fill((0, 0, 0, 0))
+        self.surf.blits([(surf, element_rect.move(-rect.left, -rect.top)) for surf, element_rect in elements], False)
+        self.rect = rect
+        self.dirty = False
+
+    def display(self):
+        # returns the screen rects that changed since the last frame
+        changed = []
+        state = (self.player.selected_tool, self.player.selected_seed, self.clock_minutes())
+        if self.dirty or state != self.state:
+            if self.rect:
+                changed.append(self.rect)
+            self.state = state
+            self.redraw(state[2])
+            changed.append(self.rect)
+        self.display_surface.blit(self.surf, self.rect)
+        return changed
+
+
+class PerfOverlay:
+    def __init__(self, level, display_surface):
+        # general setup
+        self.display_surface = display_surface
+        self.level = level
+        self.profiler = level.profiler
+        self.font = assets.font('./font/LycheeSoda.ttf', 20)
+        self.visible = False
+
+        # the panel is redrawn a few times per second only,text rendering is not free
+        self.surf = pygame.Surface(PERF_OVERLAY_SIZE, pygame.SRCALPHA)
+        self.rect = self.surf.get_rect(bottomleft=PERF_OVERLAY_POSITION)
+        self.frames_until_redraw = 0
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.frames_until_redraw = 0
+
+    def text_lines(self):
+        level = self.level
+        frame_times = self.profiler.frame_times
+        frame_time = sum(frame_times) / len(frame_times) if frame_times else 0
+        lines = [f'fps {1000 / frame_time if frame_time else 0:.0f}   frame {frame_time:.2f} ms']
+        for stage in PERF_OVERLAY_STAGES:
+            history = self.profiler.history.get(stage)
+            cost = sum(history) / len(history) if history else 0
+            lines.append(f'{stage:<20} {cost:.2f} ms')
+        lines.append(f'sprites {len(level.all_sprites)}   collision {len(level.collision_sprites)}')
+        lines.append(f'rain {level.rain.drops.count + level.rain.floor.count}   '
+                     f'soil {len(level.soil_layer.soil_sprites)}')
+        lines.append(f'chunks {level.world.loaded_chunks} of {len(level.world.chunks)}')
+        return lines
+
+    def draw_graph(self, top):
+        # frame times of the last frames,the line marks the frame budget at the frame rate cap
+        width, height = self.rect.width - 20, self.rect.height - top - 10
+        graph = pygame.Rect(10, top, width, height)
+        pygame.draw.rect(self.surf, (0, 0, 0, 120), graph)
+        frame_times = list(self.profiler.frame_times)
+        scale = height / PERF_OVERLAY_GRAPH_MS
+        step = width / max(self.profiler.history_size - 1, 1)
+        if len(frame_times) > 1:
+            points = [(graph.left + index * step, graph.bottom - min(value * scale, height))
+                      for index, value in enumerate(frame_times)]
+            pygame.draw.lines(self.surf, 'yellow', False, points)
+        if FRAME_RATE_CAP:
+            budget_y = graph.bottom - min(1000 / FRAME_RATE_CAP * scale, height)
+            pygame.draw.line(self.surf, 'red', (graph.left, budget_y), (graph.right, budget_y))
+
+    def redraw(self):
+        self.surf.fill((255, 255, 255, 190))
+        top = 6
+        for line in self.text_lines():
+            text_surf = self.font.render(line, False, 'Black')
+            self.surf.blit(text_surf, (10, top))
+            top += text_surf.get_height()
+        self.draw_graph(top + 4)
+
+    def display(self):
+        if not self.visible:
+            return []
+        changed = []
+        if self.frames_until_redraw <= 0:
+            self.redraw()
+            self.frames_until_redraw = PERF_OVERLAY_REDRAW_FRAMES
+            changed.append(self.rect)
+        self.frames_until_redraw -= 1
+        self.display_surface.blit(self.surf, self.rect)
+        return changed
@@ -2,10 +2,12 @@ import pygame
 from settings import *
 from support import *
 from timer import Timer
+from inventory import Inventory
+from sounds import sounds
 
 
 class Player(pygame.sprite.Sprite):
-    def __init__(self, pos, group, collison_sprites, tree_sprites, interaction_sprites, soil_layer, toggle_shop):
+    def __init__(self, pos, group, collison_sprites, occupancy, interaction_sprites, soil_layer, toggle_shop, controls):
         super().__init__(group)
 
         self.import_assets()
@@ -22,7 +24,11 @@ class Player(pygame.sprite.Sprite):
         self.direction = pygame.math.Vector2(0, 0)
         # maintain position individually because of rect only require integer.
         self.pos = pygame.math.Vector2(self.rect.center)
+        # where the rect was before the last step,the camera draws in between the two
+        self.previous_center = self.rect.center
         self.speed = 500
+        # re-sorted by the camera every frame
+        self.moving = True
 
         # collision
         self.collison_sprites = collison_sprites
@@ -31,9 +37,7 @@ class Player(pygame.sprite.Sprite):
         # timers
         self.timers = {
             'tool use': Timer(400, self.use_tool),
-            'tool switch': Timer(200),
-            'seed use': Timer(200, self.use_seed),
-            'seed switch': Timer(200)
+            'seed use': Timer(200, self.use_seed)
         }
 
         # tools
@@ -46,41 +50,55 @@ class Player(pygame.sprite.Sprite):
         self.seed_index = 0
         self.selected_seed = self.seeds[self.seed_index]
 
-        # inventory
-        self.item_inventory = {
+        # inventory,listeners are told about every change
+        self.item_inventory = Inventory({
             'wood': 0,
             'apple': 0,
             'corn': 0,
             'tomato': 0,
-        }
-        self.seed_inventory = {
+        })
+        self.seed_inventory = Inventory({
             'corn': 5,
             'tomato': 5
-        }
-        self.money = 200
+        })
+        self.wallet = Inventory(money=200)
 
         # interaction
-        self.tree_sprites = tree_sprites
+        self.occupancy = occupancy
         self.interaction_sprites = interaction_sprites
         self.sleep = False
         self.soil_layer = soil_layer
         self.toggle_shop = toggle_shop
 
-        # sound
-        self.watering = pygame.mixer.Sound('./audio/water.mp3')
-        self.watering.set_volume(0.1)
+        # held keys for movement,the other actions come in through handle_action()
+        self.controls = controls
+
+    def place(self, pos):
+        # move without walking there,e.g. when a save is loaded
+        self.pos.update(pos)
+        self.hitbox.center = pos
+        self.rect.center = self.hitbox.center
+        self.previous_center = self.rect.center
+
+    @property
+    def money(self):
+        return self.wallet['money']
+
+    @money.setter
+    def money(self, value):
+        self.wallet['money'] = value
 
     def use_tool(self):
         if self.selected_tool == 'hoe':
             self.soil_layer.get_hit(self.target_pos)
 
         if self.selected_tool == 'axe':
-            for tree in self.tree_sprites.sprites():
+            for tree in self.occupancy.find('tree', pygame.Rect(self.target_pos, (1, 1))):
                 if tree.rect.collidepoint(self.target_pos):
                     tree.damage()
         if self.selected_tool == 'water':
             self.soil_layer.water(self.target_pos)
-            self.watering.play()
+            sounds.play('water')
 
     def get_target_pos(self):
         self.target_pos = self.rect.center + PLAYER_TOOL_OFFSET[self.status.split('_')[0]]
@@ -98,8 +116,7 @@ class Player(pygame.sprite.Sprite):
                            'right_axe': [], 'left_axe': [], 'up_axe': [], 'down_axe': []}
         for animation in self.animations.keys():
             full_path = 'graphics/character/' + animation
-            self.animations[animation] = import_folder(full_path)
-        print(self.animations)
+            self.animations[animation] = assets.folder(full_path)
 
     def animate(self, dt):
         self.frame_index += 4 * dt
@@ -109,79 +126,81 @@ class Player(pygame.sprite.Sprite):
         self.image = self.animations[self.status][int(self.frame_index)]
 
     def input(self):
-        keys = pygame.key.get_pressed()
+        held = self.controls.is_held
 
         if not self.timers['tool use'].active:
-            if keys[pygame.K_w]:
+            if held('up'):
                 self.direction.y = -1
                 self.status = 'up'
-            elif keys[pygame.K_s]:
+            elif held('down'):
                 self.direction.y = 1
                 self.status = 'down'
             else:
                 self.direction.y = 0
 
-            if keys[pygame.K_a]:
+            if held('left'):
                 self.direction.x = -1
                 self.status = 'left'
-            elif keys[pygame.K_d]:
+            elif held('right'):
                 self.direction.x = 1
                 self.status = 'right'
             else:
                 self.direction.x = 0
 
-            # tool use
-            if keys[pygame.K_SPACE]:
-                # timer for the tool use
-                self.timers['tool use'].activate()
-                self.direction = pygame.math.Vector2()
-                self.frame_index = 0
-            # change tool
-            if not self.timers['tool switch'].active and keys[pygame.K_q]:
-                self.timers['tool switch'].activate()
-                self.tool_index = (self.tool_index + 1) % len(self.tools)
-                self.selected_tool = self.tools[self.tool_index]
-
-            # seed use
-            if keys[pygame.K_e]:
-                # timer for the tool use
-                self.timers['seed use'].activate()
-                self.direction = pygame.math.Vector2()
-            # change seed
-            if not self.timers['seed switch'].active and keys[pygame.K_LCTRL]:
-                self.timers['seed switch'].activate()
-                self.seed_index = (self.seed_index + 1) % len(self.seeds)
-                self.selected_seed = self.seeds[self.seed_index]
-
-            if keys[pygame.K_RETURN]:
-                # False , don't kill self.interaction_sprites
-                collided_interaction_sprite = pygame.sprite.spritecollide(self, self.interaction_sprites, False)
-                if collided_interaction_sprite:
-                    # figure out why we use ...[0].
-                    if collided_interaction_sprite[0].name == 'Trader':
-                        self.toggle_shop()
-                    elif collided_interaction_sprite[0].name == 'Bed':
-                        self.status = 'left_idle'
-                        self.sleep = True
+    def handle_action(self, action):
+        # one call per key press,from Controls
+        if self.timers['tool use'].active:
+            return
+
+        # tool use
+        if action == 'use tool':
+            # timer for the tool use
+            self.timers['tool use'].activate()
+            self.direction = pygame.math.Vector2()
+            self.frame_index = 0
+        # change tool
+        elif action == 'switch tool':
+            self.tool_index = (self.tool_index + 1) % len(self.tools)
+            self.selected_tool = self.tools[self.tool_index]
+
+        # seed use
+        elif action == 'use seed':
+            # timer for the tool use
+            self.timers['seed use'].activate()
+            self.direction = pygame.math.Vector2()
+        # change seed
+        elif action == 'switch seed':
+            self.seed_index = (self.seed_index + 1) % len(self.seeds)
+            self.selected_seed = self.seeds[self.seed_index]
+
+        elif action == 'interact':
+            # False , don't kill self.interaction_sprites
+            collided_interaction_sprite = pygame.sprite.spritecollide(self, self.interaction_sprites, False)
+            if collided_interaction_sprite:
+                # figure out why we use ...[0].
+                if collided_interaction_sprite[0].name == 'Trader':
+                    self.toggle_shop()
+                elif collided_interaction_sprite[0].name == 'Bed':
+                    self.status = 'left_idle'
+                    self.sleep = True
 
     def collision(self, direction):
-        for sprite in self.collison_sprites.sprites():
-            if not hasattr(sprite, 'hitbox'):
-                continue
-            if not sprite.hitbox.colliderect(self.hitbox):
+        # only the hitboxes in the grid cells the player covers
+        for hitbox in self.collison_sprites.hitboxes(self.hitbox):
+            if not hitbox.colliderect(self.hitbox):
                 continue
             if direction == 'horizontal':
                 if self.direction.x > 0:  # moving right
-                    self.hitbox.right = sprite.hitbox.left
+                    self.hitbox.right = hitbox.left
                 if self.direction.x < 0:  # moving left
-                    self.hitbox.left = sprite.hitbox.right
+                    self.hitbox.left = hitbox.right
                 self.rect.centerx = self.hitbox.centerx
                 self.pos.x = self.hitbox.centerx
             elif direction == 'vertical':
                 if self.direction.y < 0:  # moving right
-                    self.hitbox.top = sprite.hitbox.bottom
+                    self.hitbox.top = hitbox.bottom
                 if self.direction.y > 0:  # moving left
-                    self.hitbox.bottom = sprite.hitbox.top
+                    self.hitbox.bottom = hitbox.top
                 self.rect.centery = self.hitbox.centery
                 self.pos.y = self.hitbox.centery
 
@@ -209,17 +228,12 @@ class Player(pygame.sprite.Sprite):
         if self.timers['tool use'].active:
             self.status = self.status.split('_')[0] + '_' + self.selected_tool
 
-    def update_timers(self):
-        for timer in self.timers.values():
-            if timer.active:
-                timer.update()
-
     # level.run():self.all_sprites.update() call this function and others which class is a Sprite and override
     # update() function
     def update(self, dt):
+        self.previous_center = self.rect.center
         self.input()
         self.get_status()
-        self.update_timers()
         self.get_target_pos()
         self.move(dt)
         self.animate(dt)
@@ -0,0 +1,50 @@
+from collections import deque
+from time import perf_counter
+
+
+class Stage:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = perf_counter()
+
+    def __exit__(self, *exc_info):
+        current = self.profiler.current
+        current[self.name] = current.get(self.name, 0) + perf_counter() - self.start
+
+
+class Profiler:
+    def __init__(self, history=120):
+        # stage name -> reusable context manager
+        self.stages = {}
+        # seconds per stage in the frame that is being measured,a stage can run several times per frame
+        self.current = {}
+        self.last_frame = {}
+
+        # milliseconds of the last frames,for graphs
+        self.history_size = history
+        self.frame_times = deque(maxlen=history)
+        self.history = {}
+        self.frame_start = perf_counter()
+
+    def stage(self, name):
+        # with profiler.stage('customize_draw'): ...
+        if name not in self.stages:
+            self.stages[name] = Stage(self, name)
+        return self.stages[name]
+
+    def end_frame(self):
+        now = perf_counter()
+        self.frame_times.append((now - self.frame_start) * 1000)
+        self.frame_start = now
+
+        for name in self.stages:
+            if name not in self.history:
+                self.history[name] = deque(maxlen=self.history_size)
+            self.history[name].append(self.current.get(name, 0) * 1000)
+        self.last_frame = self.current
+        self.current = {}
+        return self.last_frame
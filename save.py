@@ -0,0 +1,181 @@
+import os
+import struct
+import numpy as np
+from settings import *
+from crops import PLANT_TYPES
+
+# file layout,little endian:
+#   header       magic,version
+#   world        rows,cols,raining
+#   player       x,y,money,tool index,seed index
+#   inventories  items then seeds,each a count followed by (name,amount) pairs
+#   soil         rows * cols bytes of SOIL_* flags
+#   plant types  count,then the names,the 'type' of a plant record is an index into them
+#   plants       count,then PLANT_RECORD each
+#   trees        count,then TREE_RECORD each,in map order
+# the soil,plants and trees are numpy arrays written and read in one piece.
+MAGIC = b'PGSV'
+HEADER = struct.Struct('<4sH')
+WORLD = struct.Struct('<HH?')
+PLAYER = struct.Struct('<ffiBB')
+COUNT = struct.Struct('<I')
+ENTRY = struct.Struct('<B')
+AMOUNT = struct.Struct('<i')
+
+PLANT_RECORD = np.dtype([('x', '<u2'), ('y', '<u2'), ('type', 'u1'), ('age', '<f8')])
+# apples: bit n is set when the apple at APPLE_POS[name][n] is still on the tree
+TREE_RECORD = np.dtype([('health', 'i1'), ('alive', '?'), ('apples', '<u2')])
+
+
+def pack_name(name):
+    encoded = name.encode()
+    return ENTRY.pack(len(encoded)) + encoded
+
+
+def pack_inventory(inventory):
+    parts = [COUNT.pack(len(inventory))]
+    for name, amount in inventory.items():
+        parts += [pack_name(name), AMOUNT.pack(amount)]
+    return b''.join(parts)
+
+
+def pack_names(names):
+    return COUNT.pack(len(names)) + b''.join(pack_name(name) for name in names)
+
+
+def dumps(level):
+    # a snapshot of the level as bytes,cheap enough to take on the main thread
+    player = level.player
+    soil_layer = level.soil_layer
+    rows, cols = soil_layer.grid.shape
+
+    plants = np.array([(x, y, PLANT_TYPES.index(plant_type), age)
+                       for x, y, plant_type, age in sorted(soil_layer.plant_list())], dtype=PLANT_RECORD)
+    # loaded or not
+    trees = np.array(level.world.tree_list(), dtype=TREE_RECORD)
+
+    return b''.join([
+        HEADER.pack(MAGIC, SAVE_VERSION),
+        WORLD.pack(rows, cols, level.raining),
+        PLAYER.pack(player.pos.x, player.pos.y, player.money, player.tool_index, player.seed_index),
+        pack_inventory(player.item_inventory),
+        pack_inventory(player.seed_inventory),
+        soil_layer.grid.tobytes(),
+        pack_names(PLANT_TYPES),
+        COUNT.pack(len(plants)), plants.tobytes(),
+        COUNT.pack(len(trees)), trees.tobytes(),
+    ])
+
+
+class Reader:
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self.data, self.offset)
+        self.offset += layout.size
+        return values
+
+    def read(self, size):
+        chunk = self.data[self.offset:self.offset + size]
+        self.offset += size
+        return chunk
+
+    def array(self, dtype):
+        count, = self.unpack(COUNT)
+        array = np.frombuffer(self.data, dtype=dtype, count=count, offset=self.offset)
+        self.offset += count * dtype.itemsize
+        return array
+
+    def name(self):
+        size, = self.unpack(ENTRY)
+        return bytes(self.read(size)).decode()
+
+    def inventory(self):
+        count, = self.unpack(COUNT)
+        inventory = {}
+        for _ in range(count):
+            name = self.name()
+            inventory[name], = self.unpack(AMOUNT)
+        return inventory
+
+    def names(self):
+        count, = self.unpack(COUNT)
+        return [self.name() for _ in range(count)]
+
+
+def loads(level, data):
+    # puts the saved state into a level that was just built from the map.
+    # the whole save is read and checked first,a broken one raises ValueError or struct.error and changes nothing.
+    reader = Reader(data)
+    magic, version = reader.unpack(HEADER)
+    if magic != MAGIC:
+        raise ValueError('not a save file')
+    if version != SAVE_VERSION:
+        raise ValueError(f'unsupported save version {version}')
+
+    rows, cols, raining = reader.unpack(WORLD)
+    soil_layer = level.soil_layer
+    if (rows, cols) != soil_layer.grid.shape:
+        raise ValueError(f'the save is for a {cols}x{rows} map')
+
+    player = level.player
+    x, y, money, tool_index, seed_index = reader.unpack(PLAYER)
+    if tool_index >= len(player.tools) or seed_index >= len(player.seeds):
+        raise ValueError('unknown tool or seed')
+    items = reader.inventory()
+    seeds = reader.inventory()
+
+    grid = np.frombuffer(reader.read(rows * cols), dtype=np.uint8).reshape(rows, cols)
+    plant_types = reader.names()
+    unknown = set(plant_types) - set(PLANT_TYPES)
+    if unknown:
+        raise ValueError(f'unknown plant types {sorted(unknown)}')
+    plants = reader.array(PLANT_RECORD)
+    if len(plants) and (plants['type'].max() >= len(plant_types) or
+                        plants['x'].max() >= cols or plants['y'].max() >= rows):
+        raise ValueError('a plant is outside the map or of an unknown type')
+    # every plant on planted soil and every planted soil with exactly one plant
+    planted = SOIL_TILLED | SOIL_PLANTED
+    if not ((grid[plants['y'], plants['x']] & planted) == planted).all():
+        raise ValueError('a plant is not on planted soil')
+    if len(np.unique(plants['y'].astype(np.int64) * cols + plants['x'])) != len(plants):
+        raise ValueError('two plants on one tile')
+    if np.count_nonzero(grid & SOIL_PLANTED) != len(plants):
+        raise ValueError('planted soil without a plant')
+    if not (np.isfinite(plants['age']) & (plants['age'] >= 0)).all():
+        raise ValueError('a plant has an invalid age')
+
+    trees = reader.array(TREE_RECORD)
+    if len(trees) != len(level.world.tree_states):
+        raise ValueError(f'the save has {len(trees)} trees,the map {len(level.world.tree_states)}')
+
+    # everything is there,now the level changes
+    player.place((x, y))
+    player.money = money
+    player.tool_index, player.selected_tool = tool_index, player.tools[tool_index]
+    player.seed_index, player.selected_seed = seed_index, player.seeds[seed_index]
+    player.item_inventory.update(items)
+    player.seed_inventory.update(seeds)
+
+    soil_layer.restore(grid, [(int(plant['x']), int(plant['y']), plant_types[plant['type']], float(plant['age']))
+                              for plant in plants])
+    level.set_raining(raining)
+    level.world.restore_trees(trees.tolist())
+
+
+def write(path, data):
+    # written next to the old save and swapped in,a crash halfway never leaves a broken save behind
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(data)
+    os.replace(temp_path, path)
+
+
+def load_game(level, path):
+    with open(path, 'rb') as file:
+        loads(level, file.read())
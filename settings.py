@@ -1,3 +1,4 @@
+import pygame
 from pygame.math import Vector2
 
 # game information
@@ -9,10 +10,95 @@ SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 720
 TILE_SIZE = 64
 
+# game loop
+TICK_RATE = 120  # simulation steps per second,independent from the frame rate
+MAX_CATCHUP_STEPS = 5  # steps per frame at most,the rest of a long frame is dropped
+FRAME_RATE_CAP = 180  # 0 renders as fast as possible
+VSYNC = False
+# push only the changed parts of the screen to the window,a full update still happens when the camera moves
+DIRTY_RECTS = False
+DIRTY_RECT_BLOCK = 256  # changes are merged into one rect per block of this many pixels
+# assets decoded in the background behind the loading screen,anything else is loaded when it is first used
+ASSET_WORKERS = 4
+PRELOAD_FOLDERS = [f'./graphics/character/{direction}{action}' for direction in ('up', 'down', 'left', 'right')
+                   for action in ('', '_idle', '_hoe', '_water', '_axe')] + \
+                  ['./graphics/water', './graphics/soil_water', './graphics/rain/drops', './graphics/rain/floor',
+                   './graphics/fruit/corn', './graphics/fruit/tomato']
+PRELOAD_FOLDER_DICTS = ['./graphics/soil']
+PRELOAD_IMAGES = ['./graphics/world/ground.png', './graphics/stumps/small.png', './graphics/stumps/large.png',
+                  './graphics/fruit/apple.png'] + \
+                 [f'./graphics/overlay/{name}.png' for name in ('hoe', 'axe', 'water', 'corn', 'tomato')]
+PRELOAD_SOUNDS = ['./audio/success.wav', './audio/hoe.wav', './audio/plant.wav',
+                  './audio/water.mp3', './audio/axe.mp3']
+
+# sound: mixer channels per group,and every sound effect with its group and limits
+SOUND_GROUPS = {'sfx': 8, 'ambience': 2, 'ui': 2}
+SOUND_EFFECTS = {
+    'axe': {'path': './audio/axe.mp3', 'group': 'sfx', 'voices': 2, 'cooldown': 80},
+    'hoe': {'path': './audio/hoe.wav', 'group': 'sfx', 'volume': 0.1, 'voices': 2, 'cooldown': 80},
+    'plant': {'path': './audio/plant.wav', 'group': 'sfx', 'volume': 0.2, 'voices': 2, 'cooldown': 80},
+    'water': {'path': './audio/water.mp3', 'group': 'sfx', 'volume': 0.1, 'voices': 1, 'cooldown': 150},
+    'success': {'path': './audio/success.wav', 'group': 'ui', 'volume': 0.1, 'voices': 2, 'cooldown': 50},
+}
+# background music,streamed from the file
+MUSIC_PLAYLISTS = {
+    'day': ['./audio/bg.mp3'],
+    'evening': ['./audio/music.mp3', './audio/bg.mp3'],
+    'rain': ['./audio/music.mp3'],
+}
+MUSIC_EVENING = 0.6  # of the day,see Sky.day_progress
+MUSIC_VOLUME = 0.3
+MUSIC_FADE = 2000  # ms
+
+# world streaming,in chunks of STREAM_CHUNK_SIZE tiles around the player
+STREAM_CHUNK_SIZE = 16
+STREAM_LOAD_RADIUS = 1
+STREAM_EVICT_RADIUS = 2  # further than the load radius,so walking along a chunk border doesn't reload it
+STREAM_BUDGET = 1  # ms per simulation step for loading the chunks that are not on screen yet
+
+# save
+SAVE_FILE = './save/farm.sav'
+SAVE_VERSION = 2
+# tiles per side of a chunk in the camera's spatial index
+CHUNK_SIZE = 8
+
 # overlay positions
 OVERLAY_POSITIONS = {
     'tool': (40, SCREEN_HEIGHT - 15),
-    'seed': (100, SCREEN_HEIGHT - 15)
+    'seed': (100, SCREEN_HEIGHT - 15),
+    'clock': (140, SCREEN_HEIGHT - 66),
+    'money': (140, SCREEN_HEIGHT - 28)
+}
+DAY_HOURS = (6, 22)  # hud clock from morning until the sky is dark
+
+# performance overlay,toggled with F3
+PERF_OVERLAY_POSITION = (260, SCREEN_HEIGHT - 15)
+PERF_OVERLAY_SIZE = (320, 370)
+PERF_OVERLAY_REDRAW_FRAMES = 15
+PERF_OVERLAY_GRAPH_MS = 33  # top of the frame time graph
+PERF_OVERLAY_STAGES = ['customize_draw', 'world.update', 'all_sprites.update', 'plant_collision', 'rain.update',
+                       'sky.display', 'transition']
+
+# action -> keys,actions can share a key as long as they belong to different subscribers
+KEY_BINDINGS = {
+    # held
+    'up': [pygame.K_w],
+    'down': [pygame.K_s],
+    'left': [pygame.K_a],
+    'right': [pygame.K_d],
+    # player
+    'use tool': [pygame.K_SPACE],
+    'switch tool': [pygame.K_q],
+    'use seed': [pygame.K_e],
+    'switch seed': [pygame.K_LCTRL],
+    'interact': [pygame.K_RETURN],
+    # menu
+    'menu up': [pygame.K_UP],
+    'menu down': [pygame.K_DOWN],
+    'trade': [pygame.K_SPACE],
+    'close menu': [pygame.K_ESCAPE],
+    # everywhere
+    'toggle debug': [pygame.K_F3],
 }
 
 PLAYER_TOOL_OFFSET = {
@@ -36,6 +122,45 @@ LAYERS = {
     'rain drops': 10
 }
 
+# soil grid bit flags
+SOIL_FARMABLE = 1
+SOIL_TILLED = 2
+SOIL_WATERED = 4
+SOIL_PLANTED = 8
+
+# soil autotiling: neighbour mask (top = 1, right = 2, bottom = 4, left = 8) -> tile name in graphics/soil
+SOIL_TILES = {
+    0b0000: 'o',
+    0b0001: 'b',
+    0b0010: 'l',
+    0b0011: 'bl',
+    0b0100: 't',
+    0b0101: 'tb',
+    0b0110: 'tl',
+    0b0111: 'tbr',
+    0b1000: 'r',
+    0b1001: 'br',
+    0b1010: 'lr',
+    0b1011: 'lrb',
+    0b1100: 'tr',
+    0b1101: 'tbl',
+    0b1110: 'lrt',
+    0b1111: 'x'
+}
+
+# rain particles
+RAIN_POOL_SIZE = 256
+RAIN_DROPS_PER_SECOND = 60
+RAIN_FLOOR_PER_SECOND = 60
+RAIN_LIFETIME = (0.4, 0.5)  # seconds
+RAIN_DROP_SPEED = (200, 250)  # pixels per second along RAIN_DIRECTION
+RAIN_DIRECTION = (-2, 4)
+RAIN_MARGIN = 128  # drops also spawn this far outside the viewport
+
+# sky and sleep transition, colour units per second
+SKY_SPEED = 2
+TRANSITION_SPEED = 360
+
 # offset of the apple in trees
 APPLE_POS = {
     'Small': [(18, 17), (30, 37), (12, 50), (30, 45), (20, 30), (30, 10)],
@@ -1,76 +1,134 @@
 import pygame
 from settings import *
-from support import import_folder
-from sprites import Generic
-from random import randint, choice
+from support import assets
+import numpy as np
 
 
 class Sky:
-    def __init__(self):
-        self.display_surface = pygame.display.get_surface()
+    def __init__(self, display_surface):
+        self.display_surface = display_surface
         self.full_surf = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
         self.start_color = [255, 255, 255]
         self.end_color = (38, 101, 189)
+        self.color = None  # the color full_surf is filled with
 
-    def display(self, dt):
+    def update(self, dt):
         for index, value in enumerate(self.end_color):
             if self.start_color[index] > value:
-                self.start_color[index] -= 2 * dt
+                self.start_color[index] = max(value, self.start_color[index] - SKY_SPEED * dt)
+
+    def day_progress(self):
+        # 0 in the morning,1 once the sky is fully dark
+        return (255 - self.start_color[0]) / (255 - self.end_color[0])
 
-        self.full_surf.fill(self.start_color)
+    def display(self):
+        # returns the changed screen rects like the other display() methods,None for the whole screen
+        color = [int(value) for value in self.start_color]
+        changed = color != self.color
+        if changed:
+            self.color = color
+            self.full_surf.fill(color)
         self.display_surface.blit(self.full_surf, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+        return None if changed else []
 
 
-class Drop(Generic):
-    def __init__(self, surf, pos, moving, grouops, z):
-        # general setup
-        super().__init__(pos, surf, grouops, z)
-        self.lifetime = randint(400, 500)
-        self.start_time = pygame.time.get_ticks()
+class ParticlePool:
+    def __init__(self, capacity):
+        # preallocated arrays,the first 'count' slots are the live particles
+        self.capacity = capacity
+        self.count = 0
+        self.pos = np.zeros((capacity, 2), dtype=np.float32)
+        self.velocity = np.zeros((capacity, 2), dtype=np.float32)
+        self.lifetime = np.zeros(capacity, dtype=np.float32)
+        self.frame = np.zeros(capacity, dtype=np.intp)
 
-        # moving
-        self.moving = moving
-        if self.moving:
-            # In pygame,this is three basic attributes of an object if you want to move it.
-            self.pos = pygame.math.Vector2(self.rect.topleft)
-            self.direction = pygame.math.Vector2(-2, 4)
-            self.speed = randint(200, 250)
+    def spawn(self, amount, area, speed, lifetime, frames):
+        amount = min(amount, self.capacity - self.count)
+        if amount <= 0:
+            return
+        new = slice(self.count, self.count + amount)
+        self.pos[new, 0] = np.random.uniform(area.left, area.right, amount)
+        self.pos[new, 1] = np.random.uniform(area.top, area.bottom, amount)
+        self.velocity[new] = RAIN_DIRECTION
+        self.velocity[new] *= np.random.uniform(*speed, (amount, 1))
+        self.lifetime[new] = np.random.uniform(*lifetime, amount)
+        self.frame[new] = np.random.randint(0, frames, amount)
+        self.count += amount
 
     def update(self, dt):
-        # movement
-        if self.moving:
-            self.pos += self.direction * self.speed * dt
-            self.rect.topleft = (round(self.pos.x), round(self.pos.y))
+        live = slice(0, self.count)
+        self.pos[live] += self.velocity[live] * dt
+        self.lifetime[live] -= dt
 
-        if pygame.time.get_ticks() - self.start_time >= self.lifetime:
-            self.kill()
+        # move the survivors to the front
+        alive = self.lifetime[live] > 0
+        count = int(alive.sum())
+        if count < self.count:
+            for array in (self.pos, self.velocity, self.lifetime, self.frame):
+                array[:count] = array[live][alive]
+            self.count = count
 
 
 class Rain:
-    def __init__(self, all_sprites):
+    def __init__(self, all_sprites, map_size):
         self.all_sprites = all_sprites
-        self.rain_drops = import_folder('./graphics/rain/drops/')
-        self.rain_floor = import_folder('./graphics/rain/floor/')
-        self.floor_w, self.floor_h = pygame.image.load('./graphics/world/ground.png').get_size()
-
-    def create_floor(self):
-        Drop(
-            surf=choice(self.rain_floor),
-            pos=(randint(0, self.floor_w), randint(0, self.floor_h)),
-            moving=False,
-            grouops=self.all_sprites,
-            z=LAYERS['rain floor']
-        )
-
-    def create_drops(self):
-        Drop(
-            surf=choice(self.rain_drops),
-            pos=(randint(0, self.floor_w), randint(0, self.floor_h)),
-            moving=True,
-            grouops=self.all_sprites,
-            z=LAYERS['rain drops']
-        )
-
-    def update(self):
-        self.create_drops()
-        self.create_floor()
+        self.rain_drops = assets.folder('./graphics/rain/drops/')
+        self.rain_floor = assets.folder('./graphics/rain/floor/')
+        self.floor_w, self.floor_h = map_size
+        self.raining = False
+
+        # particles
+        self.drops = ParticlePool(RAIN_POOL_SIZE)
+        self.floor = ParticlePool(RAIN_POOL_SIZE)
+        self.spawn_area = pygame.Rect(0, 0, 0, 0)
+        # fraction of a particle carried to the next update
+        self.drops_due = 0
+        self.floor_due = 0
+        # length of the last update,used to interpolate the drops between two steps
+        self.step = 0
+
+        # drawn as part of the camera's blit batch
+        all_sprites.add_layer_renderer(LAYERS['rain floor'], self.draw_floor)
+        all_sprites.add_layer_renderer(LAYERS['rain drops'], self.draw_drops)
+
+    def update_spawn_area(self):
+        # only in and around the viewport,clipped to the map
+        view = self.all_sprites.view
+        self.spawn_area = view.inflate(RAIN_MARGIN * 2, RAIN_MARGIN * 2).clip(0, 0, self.floor_w, self.floor_h)
+
+    def create_floor(self, dt):
+        self.floor_due += RAIN_FLOOR_PER_SECOND * dt
+        amount = int(self.floor_due)
+        self.floor_due -= amount
+        self.floor.spawn(amount, self.spawn_area, (0, 0), RAIN_LIFETIME, len(self.rain_floor))
+
+    def create_drops(self, dt):
+        self.drops_due += RAIN_DROPS_PER_SECOND * dt
+        amount = int(self.drops_due)
+        self.drops_due -= amount
+        self.drops.spawn(amount, self.spawn_area, RAIN_DROP_SPEED, RAIN_LIFETIME, len(self.rain_drops))
+
+    def draw(self, pool, frames, blit_sequence, view, alpha):
+        if not pool.count:
+            return
+        live = slice(0, pool.count)
+        # step back from the latest position to where the drop was at 'alpha'
+        pos = pool.pos[live] - pool.velocity[live] * (self.step * (1 - alpha)) - view.topleft
+        blit_sequence.extend((frames[frame], (x, y))
+                             for (x, y), frame in zip(pos.astype(int).tolist(), pool.frame[live].tolist()))
+
+    def draw_floor(self, blit_sequence, view, alpha):
+        self.draw(self.floor, self.rain_floor, blit_sequence, view, alpha)
+
+    def draw_drops(self, blit_sequence, view, alpha):
+        self.draw(self.drops, self.rain_drops, blit_sequence, view, alpha)
+
+    def update(self, dt):
+        # game time based,so the amount of rain does not depend on the frame rate
+        self.step = dt
+        self.drops.update(dt)
+        self.floor.update(dt)
+        if self.raining:
+            self.update_spawn_area()
+            self.create_drops(dt)
+            self.create_floor(dt)
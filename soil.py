@@ -1,8 +1,10 @@
 import pygame
+import numpy as np
 from settings import *
-from pytmx.util_pygame import load_pygame
 from support import *
 from random import choice
+from sounds import sounds
+from crops import CropEngine, PLANT_TYPES
 
 
 class SoilTile(pygame.sprite.Sprite):
@@ -22,18 +24,16 @@ class WaterTile(pygame.sprite.Sprite):
 
 
 class Plant(pygame.sprite.Sprite):
-    def __init__(self, plant_type, groups, soil, check_watered):
+    def __init__(self, plant_type, groups, soil):
         super().__init__(groups)
         # setup
         self.plant_type = plant_type
-        self.frames = import_folder(f'./graphics/fruit/{plant_type}')
+        self.frames = assets.folder(f'./graphics/fruit/{plant_type}')
         self.soil = soil
-        self.check_watered = check_watered
 
-        # plant growing
+        # plant growing,the age comes from the crop engine
         self.age = 0
         self.max_age = len(self.frames) - 1
-        self.grow_speed = GROW_SPEED[self.plant_type]
         self.harvestable = False
 
         # sprite setup
@@ -42,25 +42,26 @@ class Plant(pygame.sprite.Sprite):
         self.rect = self.image.get_rect(midbottom=soil.rect.midbottom + pygame.math.Vector2(0, self.y_offset))
         self.z = LAYERS['ground plant']
 
-    def grow(self):
-        if self.check_watered(self.rect.center):
-            self.age += self.grow_speed
+    def set_age(self, age):
+        # see SoilLayer.sync_plants
+        self.age = age
 
-            if int(self.age) > 0:
-                self.z = LAYERS['main']
-                self.hitbox = self.rect.copy().inflate(-26, self.rect.height * 0.4)
+        if int(self.age) > 0:
+            self.z = LAYERS['main']
+            self.hitbox = self.rect.copy().inflate(-26, self.rect.height * 0.4)
 
-            if self.age >= self.max_age:
-                self.age = self.max_age
-                self.harvestable = True
+        if self.age >= self.max_age:
+            self.age = self.max_age
+            self.harvestable = True
 
-            self.image = self.frames[int(self.age)]
-            # the image changed
-            self.rect = self.image.get_rect(midbottom=self.soil.rect.midbottom + pygame.math.Vector2(0, self.y_offset))
+        self.image = self.frames[int(self.age)]
+        # the image changed
+        self.rect = self.image.get_rect(midbottom=self.soil.rect.midbottom + pygame.math.Vector2(0, self.y_offset))
+        refresh_groups(self)
 
 
 class SoilLayer:
-    def __init__(self, all_sprites, collision_sprites):
+    def __init__(self, all_sprites, collision_sprites, map_data, occupancy):
         # requirements
         # if the area is farm-able
         # if the soil has been watered
@@ -72,150 +73,189 @@ class SoilLayer:
         self.soil_sprites = pygame.sprite.Group()
         self.water_sprites = pygame.sprite.Group()
         self.plant_sprites = pygame.sprite.Group()
+        # (col, row) -> SoilTile,WaterTile,Plant,kept in the level's occupancy map
+        self.occupancy = occupancy
+        self.soil_tiles = occupancy.layer('soil')
+        self.water_tiles = occupancy.layer('water')
+        self.plants = occupancy.layer('plant')
 
         # graphics
-        self.soil_surfs = import_folder_dict('./graphics/soil/')
-        self.water_surfs = import_folder('./graphics/soil_water/')
+        self.soil_surfs = assets.folder_dict('./graphics/soil/')
+        self.water_surfs = assets.folder('./graphics/soil_water/')
 
-        self.create_soil_grid()
-        self.create_hit_rects()
+        self.create_soil_grid(map_data)
+
+        # the world streamer loads the sprites of an area when the player gets close.
+        # the grid always covers the whole map,so does the crop engine.
+        self.loaded = np.zeros(self.grid.shape, dtype=bool)
+        self.areas = set()  # (left, top, right, bottom) in tiles
+
+        # the state of every plant,loaded or not.the plant sprites only show it
+        self.crops = CropEngine({plant_type: len(assets.folder(f'./graphics/fruit/{plant_type}')) - 1
+                                 for plant_type in PLANT_TYPES})
 
         # raining
         self.raining = False
 
-        # sounds
-        self.hoe_sound = pygame.mixer.Sound('./audio/hoe.wav')
-        self.hoe_sound.set_volume(0.1)
-
-        self.plant_sound = pygame.mixer.Sound('./audio/plant.wav')
-        self.plant_sound.set_volume(0.2)
-
-    def create_soil_grid(self):
-        # maintain a grid list of farm-able tiles.
-        ground = pygame.image.load('./graphics/world/ground.png')
-        h_tiles, v_tiles = ground.get_width() // TILE_SIZE, ground.get_height() // TILE_SIZE
-        self.grid = [[[] for col in range(h_tiles)] for row in range(v_tiles)]
-        for x, y, _ in load_pygame('./data/map.tmx').get_layer_by_name('Farmable').tiles():
-            self.grid[y][x].append('F')
-
-    def create_hit_rects(self):
-        self.hit_rects = []
-        for index_row, row in enumerate(self.grid):
-            for index_col, cell in enumerate(row):
-                if 'F' in cell:
-                    x = index_col * TILE_SIZE
-                    y = index_row * TILE_SIZE
-                    rect = pygame.Rect(x, y, TILE_SIZE, TILE_SIZE)
-                    self.hit_rects.append(rect)
+    def create_soil_grid(self, map_data):
+        # one byte of SOIL_* flags per tile,indexed [row, col]
+        self.grid = np.zeros((map_data.rows, map_data.cols), dtype=np.uint8)
+        if map_data.farmable:
+            cols, rows = zip(*map_data.farmable)
+            self.grid[list(rows), list(cols)] = SOIL_FARMABLE
 
-    def get_hit(self, point):
-        for rect in self.hit_rects:
-            if rect.collidepoint(point):
-                self.hoe_sound.play()
-                x = rect.x // TILE_SIZE
-                y = rect.y // TILE_SIZE
-                if 'F' in self.grid[y][x]:
-                    self.grid[y][x].append('X')
-                    self.create_soil_tiles()
-                    if self.raining:
-                        self.water_all()
+    def set_flag(self, x, y, flag):
+        self.grid[y, x] |= flag
 
-    def water(self, tartget_pos):
-        for soil_sprite in self.soil_sprites.sprites():
-            if soil_sprite.rect.collidepoint(tartget_pos):
-                # 1. add an entry to the soil grid -> 'w'
-                x = soil_sprite.rect.x // TILE_SIZE
-                y = soil_sprite.rect.y // TILE_SIZE
-                self.grid[y][x].append('W')
-                # 2. create a water sprite
-                # 2.1.copy the position from the soil sprite
-                # 2.2. for the surface -> import the folder '../graphics/soil_water'
-                # 2.3.randomly select on surface
-                # 2.4.create one more group 'water_sprites'
-                pos = soil_sprite.rect.topleft
-                surf = choice(self.water_surfs)
-                WaterTile(pos, surf, [self.all_sprites, self.water_sprites])
-
-    def water_all(self):
-        for index_row, row in enumerate(self.grid):
-            for index_col, cell in enumerate(row):
-                if 'X' in cell and 'W' not in cell:
-                    cell.append('W')
-                    x = index_col * TILE_SIZE
-                    y = index_row * TILE_SIZE
-                    WaterTile((x, y), choice(self.water_surfs), [self.all_sprites, self.water_sprites])
-
-    def remove_water(self):
-        # destory all water sprites
-        for sprite in self.water_sprites.sprites():
-            sprite.kill()
+    def clear_flag(self, x, y, flag):
+        self.grid[y, x] &= ~np.uint8(flag)
 
-        # clean up the grid
-        for row in self.grid:
-            for cell in row:
-                if 'W' in cell:
-                    cell.remove('W')
+    def has_flag(self, x, y, flag):
+        return bool(self.grid[y, x] & flag)
 
-    def check_watered(self, pos):
-        x = pos[0] // TILE_SIZE
-        y = pos[1] // TILE_SIZE
-        cell = self.grid[y][x]
-        is_watered = 'W' in cell
-        return is_watered
+    def in_grid(self, x, y):
+        rows, cols = self.grid.shape
+        return 0 <= y < rows and 0 <= x < cols
+
+    def get_hit(self, point):
+        x, y = tile_of(point)
+        if self.in_grid(x, y) and self.has_flag(x, y, SOIL_FARMABLE):
+            sounds.play('hoe')
+            if not self.has_flag(x, y, SOIL_TILLED):
+                self.set_flag(x, y, SOIL_TILLED)
+                self.create_soil_tiles(x, y)
+                if self.raining:
+                    self.water_cell(x, y)
+
+    def water(self, tartget_pos):
+        # 1. flag the soil as watered
+        # 2. create a water sprite at the position of the soil sprite with a random surface
+        # watering the same tile twice does nothing
+        if self.occupancy.get('soil', tartget_pos):
+            self.water_cell(*tile_of(tartget_pos))
+
+    def water_cell(self, x, y):
+        if self.has_flag(x, y, SOIL_TILLED) and not self.has_flag(x, y, SOIL_WATERED):
+            self.set_flag(x, y, SOIL_WATERED)
+            self.create_water_tile(x, y)
+
+    def create_water_tile(self, x, y):
+        if self.loaded[y, x]:
+            self.water_tiles[(x, y)] = WaterTile((x * TILE_SIZE, y * TILE_SIZE), choice(self.water_surfs),
+                                                 [self.all_sprites, self.water_sprites])
 
     def plant_seed(self, target_pos, seed):
-        for soil_sprite in self.soil_sprites.sprites():
-            if soil_sprite.rect.collidepoint(target_pos):
-                self.plant_sound.play()
-
-                x = soil_sprite.rect.x // TILE_SIZE
-                y = soil_sprite.rect.y // TILE_SIZE
-                if 'P' not in self.grid[y][x]:
-                    self.grid[y][x].append('P')
-                    Plant(seed, [self.all_sprites, self.collision_sprites, self.plant_sprites], soil_sprite,
-                          self.check_watered)
-
-    def update_plants(self):
-        for plant in self.plant_sprites.sprites():
-            plant.grow()
-
-    def create_soil_tiles(self):
-        # to change the shape of the old soil when a new soil is next to it.It means we need to redraw all the soil.
-        self.soil_sprites.empty()
-        for index_row, row in enumerate(self.grid):
-            for index_col, cell in enumerate(row):
-                if 'X' in cell:
-
-                    # tile options
-                    t = 'X' in self.grid[index_row - 1][index_col]
-                    b = 'X' in self.grid[index_row + 1][index_col]
-                    r = 'X' in row[index_col + 1]
-                    l = 'X' in row[index_col - 1]
-                    tile_tpye = 'o'
-
-                    # all sides
-                    if all((t, r, b, l)): tile_tpye = 'x'
-                    # horizontal tiles only
-                    if l and not any((t, r, b)): tile_tpye = 'r'
-                    if r and not any((t, l, b)): tile_tpye = 'l'
-                    if r and l and not any((t, b)): tile_tpye = 'lr'
-                    # vertical only
-                    if b and not any((l, r, t)): tile_tpye = 't'
-                    if t and not any((r, l, b)): tile_tpye = 'b'
-                    if t and b and not any((r, l)): tile_tpye = 'tb'
-                    # corners
-                    if l and b and not any((t, r)): tile_tpye = 'tr'
-                    if l and t and not any((b, r)): tile_tpye = 'br'
-                    if r and b and not any((t, l)): tile_tpye = 'tl'
-                    if r and t and not any((b, l)): tile_tpye = 'bl'
-                    # T shapes
-                    if all((t, b, r)) and not l: tile_tpye = 'tbr'
-                    if all((t, b, l)) and not r: tile_tpye = 'tbl'
-                    if all((t, l, r)) and not b: tile_tpye = 'lrb'
-                    if all((l, b, r)) and not t: tile_tpye = 'lrt'
-
-                    SoilTile(
-                        pos=(index_col * TILE_SIZE, index_row * TILE_SIZE),
-                        surf=self.soil_surfs[tile_tpye],
-                        groups=[self.all_sprites, self.soil_sprites]
-                    )
+        if self.occupancy.get('soil', target_pos):
+            sounds.play('plant')
+
+            x, y = tile_of(target_pos)
+            if not self.has_flag(x, y, SOIL_PLANTED):
+                self.set_flag(x, y, SOIL_PLANTED)
+                self.create_plant(x, y, seed)
+
+    def create_plant(self, x, y, plant_type, age=0):
+        self.crops.add(x, y, plant_type, age)
+        if self.loaded[y, x]:
+            self.create_plant_sprite(x, y)
+
+    def create_plant_sprite(self, x, y):
+        plant_type, age = self.crops.get(x, y)
+        plant = Plant(
+            plant_type=plant_type,
+            groups=[self.all_sprites, self.collision_sprites, self.plant_sprites],
+            soil=self.soil_tiles[(x, y)]
+        )
+        if age:
+            plant.set_age(age)
+        self.plants[(x, y)] = plant
+
+    def remove_plant(self, plant):
+        x, y = plant.soil.rect.x // TILE_SIZE, plant.soil.rect.y // TILE_SIZE
+        self.clear_flag(x, y, SOIL_PLANTED)
+        del self.plants[(x, y)]
+        self.crops.remove(x, y)
+
+    def plant_list(self):
+        # (x, y, plant_type, age) of every plant,loaded or not
+        return self.crops.plants()
+
+    def fast_forward(self, rain_days):
+        # nights pass,rain_days: whether it rains on each of the new days.
+        # every night watered plants grow and the water dries up,on rainy days all tilled soil is watered again.
+        for sprite in self.water_sprites.sprites():
+            sprite.kill()
+        self.water_tiles.clear()
+        self.crops.fast_forward(self.grid, rain_days)
+        for y, x in np.argwhere(((self.grid & SOIL_WATERED) != 0) & self.loaded):
+            self.create_water_tile(int(x), int(y))
+
+    def sync_plants(self, view):
+        # update the sprites of the plants that grew,only for the ones in view (a rect in pixels)
+        left, top = view.left // TILE_SIZE, view.top // TILE_SIZE
+        right, bottom = -(-view.right // TILE_SIZE), -(-view.bottom // TILE_SIZE)
+        crops = self.crops
+        for row in crops.take_dirty(left, top, right, bottom):
+            plant = self.plants.get((int(crops.x[row]), int(crops.y[row])))
+            if plant:
+                plant.set_age(float(crops.age[row]))
+
+    def is_tilled(self, x, y):
+        return self.in_grid(x, y) and self.has_flag(x, y, SOIL_TILLED)
+
+    def update_soil_tile(self, x, y):
+        # pick the tile from the tilled neighbours and reuse the sprite if there is one
+        if not self.loaded[y, x]:
+            return
+        mask = self.is_tilled(x, y - 1) | self.is_tilled(x + 1, y) << 1 | \
+            self.is_tilled(x, y + 1) << 2 | self.is_tilled(x - 1, y) << 3
+        surf = self.soil_surfs[SOIL_TILES[mask]]
+        if (x, y) in self.soil_tiles:
+            self.soil_tiles[(x, y)].image = surf
+        else:
+            self.soil_tiles[(x, y)] = SoilTile(
+                pos=(x * TILE_SIZE, y * TILE_SIZE),
+                surf=surf,
+                groups=[self.all_sprites, self.soil_sprites]
+            )
+
+    def load_area(self, left, top, right, bottom):
+        # create the sprites of an area in tiles,right and bottom are exclusive
+        self.areas.add((left, top, right, bottom))
+        self.loaded[top:bottom, left:right] = True
+        grid = self.grid[top:bottom, left:right]
+        for y, x in np.argwhere(grid & SOIL_TILLED):
+            self.update_soil_tile(left + int(x), top + int(y))
+        for y, x in np.argwhere(grid & SOIL_WATERED):
+            self.create_water_tile(left + int(x), top + int(y))
+        for y, x in np.argwhere(grid & SOIL_PLANTED):
+            key = (left + int(x), top + int(y))
+            if key in self.crops:
+                self.create_plant_sprite(*key)
+
+    def unload_area(self, left, top, right, bottom):
+        # remove the sprites of an area,the plants stay in the crop engine
+        self.areas.discard((left, top, right, bottom))
+        self.loaded[top:bottom, left:right] = False
+        for y in range(top, bottom):
+            for x in range(left, right):
+                for tiles in (self.plants, self.soil_tiles, self.water_tiles):
+                    if (x, y) in tiles:
+                        tiles.pop((x, y)).kill()
+
+    def restore(self, grid, plants):
+        # replace the soil with a saved one,plants: (x, y, plant_type, age)
+        areas = list(self.areas)
+        for area in areas:
+            self.unload_area(*area)
+        self.grid[:] = grid
+        self.crops.clear()
+        for x, y, plant_type, age in plants:
+            self.crops.add(x, y, plant_type, age)
+        for area in areas:
+            self.load_area(*area)
+
+    def create_soil_tiles(self, x, y):
+        # a new soil changes the shape of the soil next to it,so only the cell and its neighbours are redrawn.
+        for col, row in ((x, y), (x, y - 1), (x + 1, y), (x, y + 1), (x - 1, y)):
+            if self.is_tilled(col, row):
+                self.update_soil_tile(col, row)
@@ -0,0 +1,126 @@
+import pygame
+from settings import *
+from support import assets
+
+
+class SoundEffect:
+    def __init__(self, path, group, volume=1, voices=2, cooldown=0):
+        self.path = path
+        self.group = group
+        self.volume = volume
+        self.voices = voices  # copies that may play at the same time
+        self.cooldown = cooldown  # ms before it can be triggered again
+        self.sound = None
+        self.last_played = None
+        self.channels = []  # the channels it was started on,some may be playing something else by now
+
+
+class SoundManager:
+    def __init__(self, effects=SOUND_EFFECTS, groups=SOUND_GROUPS):
+        # every effect is decoded once (through the asset registry) and played on the channels of its group,
+        # so the mixer never plays more than the channels we give it however many trees there are.
+        self.effects = {name: SoundEffect(**effect) for name, effect in effects.items()}
+        self.group_sizes = groups
+        self.groups = None  # group -> channels,made once the mixer is running
+
+    def setup(self):
+        channels = sum(self.group_sizes.values())
+        pygame.mixer.set_num_channels(channels)
+        # reserved channels are never picked by Sound.play(),only we hand them out
+        pygame.mixer.set_reserved(channels)
+        self.groups = {}
+        index = 0
+        for group, size in self.group_sizes.items():
+            self.groups[group] = [pygame.mixer.Channel(index + offset) for offset in range(size)]
+            index += size
+
+    def load(self, effect):
+        if effect.sound is None:
+            effect.sound = assets.sound(effect.path)
+        return effect.sound
+
+    def find_channel(self, group):
+        # a free channel of the group,or the one that has been playing the longest.
+        # channels are kept in the order they were started,the last one is the newest.
+        channels = self.groups[group]
+        channel = next((channel for channel in channels if not channel.get_busy()), channels[0])
+        channels.remove(channel)
+        channels.append(channel)
+        return channel
+
+    def play(self, name):
+        # without a mixer (headless runs) there is nothing to do
+        if not pygame.mixer.get_init():
+            return
+        if self.groups is None:
+            self.setup()
+
+        effect = self.effects[name]
+        now = pygame.time.get_ticks()
+        if effect.last_played is not None and now - effect.last_played < effect.cooldown:
+            return
+        sound = self.load(effect)
+        effect.channels = [channel for channel in effect.channels
+                           if channel.get_busy() and channel.get_sound() is sound]
+        if len(effect.channels) >= effect.voices:
+            return
+
+        channel = self.find_channel(effect.group)
+        channel.set_volume(effect.volume)
+        channel.play(sound)
+        effect.channels.append(channel)
+        effect.last_played = now
+
+    def stop(self):
+        if self.groups:
+            for channels in self.groups.values():
+                for channel in channels:
+                    channel.stop()
+
+
+class MusicPlayer:
+    def __init__(self, playlists=MUSIC_PLAYLISTS):
+        # the music is streamed from the file by pygame.mixer.music,only a small buffer is ever decoded.
+        # mood -> tracks,the mood follows the weather and the time of day.
+        self.playlists = playlists
+        self.mood = None
+        self.index = 0
+
+    def choose_mood(self, raining, day_progress):
+        if raining:
+            return 'rain'
+        return 'evening' if day_progress >= MUSIC_EVENING else 'day'
+
+    def play_next(self):
+        tracks = self.playlists[self.mood]
+        self.index = (self.index + 1) % len(tracks)
+        pygame.mixer.music.load(tracks[self.index])
+        pygame.mixer.music.set_volume(MUSIC_VOLUME)
+        pygame.mixer.music.play(fade_ms=MUSIC_FADE)
+
+    def update(self, raining, day_progress):
+        if not pygame.mixer.get_init():
+            return
+
+        mood = self.choose_mood(raining, day_progress)
+        if mood != self.mood:
+            # fade the old track out,the new one fades in once it is quiet
+            self.mood = mood
+            self.index = -1
+            if pygame.mixer.music.get_busy():
+                pygame.mixer.music.fadeout(MUSIC_FADE)
+                return
+
+        # the track ended or the fade out is done
+        if not pygame.mixer.music.get_busy():
+            self.play_next()
+
+    def stop(self):
+        if pygame.mixer.get_init():
+            pygame.mixer.music.stop()
+        self.mood = None
+
+
+# shared by the whole game
+sounds = SoundManager()
+music = MusicPlayer()
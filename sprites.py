@@ -1,7 +1,9 @@
 import pygame
 from settings import *
 from random import randint, choice
-from timer import Timer
+from timer import game_clock
+from support import assets, refresh_groups
+from sounds import sounds
 
 
 class Generic(pygame.sprite.Sprite):
@@ -52,8 +54,9 @@ class WildFlower(Generic):
 class Partical(Generic):
     def __init__(self, pos, surf, groups, z, duration=200):
         super().__init__(pos, surf, groups, z)
-        self.start_time = pygame.time.get_ticks()
+        # the scheduler removes the particle,nothing to poll
         self.duration = duration
+        game_clock.call_later(duration, self.kill)
 
         # white surface
         mask_surf = pygame.mask.from_surface(self.image)
@@ -61,41 +64,39 @@ class Partical(Generic):
         new_surf.set_colorkey((0, 0, 0))
         self.image = new_surf
 
-    def update(self, dt):
-        current_time = pygame.time.get_ticks()
-        if current_time - self.start_time > self.duration:
-            self.kill()
-
 
 class Tree(Generic):
-    def __init__(self, pos, surf, groups, name, player_add):
+    def __init__(self, pos, surf, groups, name, player_add, state=None):
         super().__init__(pos, surf, groups)
+        # Sprite.groups() is a set,so keep 'all_sprites' (the first group) around for particles and apples
+        self.all_sprites = groups[0]
 
         # tree attributes
         self.name = name
         self.health = 5
         self.alive = True
         stump_path = f'./graphics/stumps/{"small" if name == "Small" else "large"}.png'
-        self.stump_surf = pygame.image.load(stump_path).convert_alpha()
+        self.stump_surf = assets.image(stump_path)
 
         # apples
-        self.apples_surf = pygame.image.load('./graphics/fruit/apple.png')
+        self.apples_surf = assets.image('./graphics/fruit/apple.png')
         self.apple_pos = APPLE_POS[name]
         self.apple_sprites = pygame.sprite.Group()
-        self.create_fruit()
+        # state: what state() returned before the tree was unloaded,a new tree grows its own apples
+        if state is None:
+            self.create_fruit()
+        else:
+            self.restore(*state)
 
         # player item add
         self.player_add = player_add
 
-        # sounds
-        self.axe_sound = pygame.mixer.Sound('./audio/axe.mp3')
-
     def damage(self):
         # damaging the tree
         self.health -= 1
 
         # play sound
-        self.axe_sound.play()
+        sounds.play('axe')
 
         # remove an apple
         if len(self.apple_sprites.sprites()) > 0:
@@ -103,7 +104,7 @@ class Tree(Generic):
             Partical(
                 pos=random_apple.rect.topleft,
                 surf=random_apple.image,
-                groups=self.groups()[0],
+                groups=self.all_sprites,
                 z=LAYERS['fruit']
             )
             self.player_add('apple')
@@ -114,15 +115,20 @@ class Tree(Generic):
             Partical(
                 pos=self.rect.topleft,
                 surf=self.image,
-                groups=self.groups()[0],
+                groups=self.all_sprites,
                 z=LAYERS['fruit'],
                 duration=400
             )
-            self.image = self.stump_surf
-            self.rect = self.image.get_rect(midbottom=self.rect.midbottom)
-            self.hitbox = self.rect.copy().inflate(-10, -self.rect.height * 0.6)
             self.player_add('wood')
-            self.alive = False
+            self.become_stump()
+
+    def become_stump(self):
+        # also used when a save is loaded
+        self.image = self.stump_surf
+        self.rect = self.image.get_rect(midbottom=self.rect.midbottom)
+        self.hitbox = self.rect.copy().inflate(-10, -self.rect.height * 0.6)
+        self.alive = False
+        refresh_groups(self)
 
     def update(self, dt):
         if self.alive:
@@ -131,9 +137,32 @@ class Tree(Generic):
     def create_fruit(self):
         if not self.alive:
             return
-        for pos in self.apple_pos:
+        for slot in range(len(self.apple_pos)):
             if randint(0, 10) < 2:
-                x = pos[0] + self.rect.left
-                y = pos[1] + self.rect.top
-                # the first group is 'all_sprites'
-                Generic((x, y), self.apples_surf, [self.apple_sprites, self.groups()[0]], LAYERS['fruit'])
+                self.create_apple(slot)
+
+    def state(self):
+        # (health, alive, apples),apples has bit n set when the apple at apple_pos[n] is on the tree
+        apples = 0
+        for apple in self.apple_sprites:
+            apples |= 1 << apple.slot
+        return self.health, self.alive, apples
+
+    def restore(self, health, alive, apples):
+        # used when a save is loaded and when the world streamer brings the tree back
+        self.health = health
+        for apple in self.apple_sprites.sprites():
+            apple.kill()
+        if alive:
+            for slot in range(len(self.apple_pos)):
+                if apples >> slot & 1:
+                    self.create_apple(slot)
+        elif self.alive:
+            self.become_stump()
+
+    def create_apple(self, slot):
+        x = self.apple_pos[slot][0] + self.rect.left
+        y = self.apple_pos[slot][1] + self.rect.top
+        apple = Generic((x, y), self.apples_surf, [self.apple_sprites, self.all_sprites], LAYERS['fruit'])
+        # the index into apple_pos,for saving
+        apple.slot = slot
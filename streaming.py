@@ -0,0 +1,242 @@
+import pygame
+from collections import deque
+from time import perf_counter
+from random import randint
+from settings import *
+from support import assets
+from sprites import Generic, Water, WildFlower, Tree
+from baker import StaticLayerBaker
+
+# tile layers that are baked into a few surfaces per chunk,(layer, z, y_sort)
+BAKED_LAYERS = [
+    ('HouseFloor', LAYERS['house bottom'], False),
+    ('HouseFurnitureBottom', LAYERS['house bottom'], False),
+    ('HouseWalls', LAYERS['main'], True),
+    ('HouseFurnitureTop', LAYERS['main'], True),
+    ('Fence', LAYERS['main'], True),
+]
+
+
+class WorldChunk:
+    def __init__(self, key, rect):
+        self.key = key
+        self.rect = rect  # in pixels,clipped to the map
+        # what the map has in this chunk,read once when the level starts
+        self.tiles = {}  # layer name -> [(x, y, surf), ...]
+        self.trees = []  # (index, tmx object)
+        self.decoration = []
+
+        # while loaded
+        self.sprites = []
+        self.tree_sprites = []
+        self.loaded = False
+        self.job = None  # the generator that is still loading it
+
+
+class WorldStreamer:
+    def __init__(self, map_data, all_sprites, collision_sprites, tree_sprites, soil_layer, occupancy, player_add):
+        # the map is split into square chunks of STREAM_CHUNK_SIZE tiles.the sprites of a chunk are made when the
+        # player comes within STREAM_LOAD_RADIUS chunks and removed again beyond STREAM_EVICT_RADIUS.
+        # trees and plants keep their state while they are unloaded.
+        self.map_data = map_data
+        self.all_sprites = all_sprites
+        self.collision_sprites = collision_sprites
+        self.tree_sprites = tree_sprites
+        self.soil_layer = soil_layer
+        self.occupancy = occupancy
+        self.player_add = player_add
+        self.chunk_pixels = STREAM_CHUNK_SIZE * TILE_SIZE
+
+        self.ground = assets.image('./graphics/world/ground.png')
+        self.water_frames = assets.folder('./graphics/water')
+
+        self.chunks = {}
+        self.index_map()
+
+        # tree index -> (health, alive, apples) of the trees that are not loaded
+        self.tree_states = [(5, True, self.random_apples(obj.name)) for obj in self.tree_objects]
+
+        # chunks waiting to be loaded,nearest first
+        self.queue = deque()
+        # chunks that are loaded or loading
+        self.active = set()
+
+    def chunk(self, x, y):
+        # the chunk a pixel position belongs to
+        key = (int(x // self.chunk_pixels), int(y // self.chunk_pixels))
+        if key not in self.chunks:
+            rect = pygame.Rect(key[0] * self.chunk_pixels, key[1] * self.chunk_pixels,
+                               self.chunk_pixels, self.chunk_pixels)
+            self.chunks[key] = WorldChunk(key, rect.clip(pygame.Rect((0, 0), self.map_data.size)))
+        return self.chunks[key]
+
+    def index_map(self):
+        map_data = self.map_data
+        for layer, _, _ in BAKED_LAYERS + [('Water', None, None)]:
+            for x, y, surf in map_data.tiles(layer):
+                self.chunk(x * TILE_SIZE, y * TILE_SIZE).tiles.setdefault(layer, []).append((x, y, surf))
+        self.tree_objects = list(map_data.objects('Trees'))
+        for index, obj in enumerate(self.tree_objects):
+            self.chunk(obj.x, obj.y).trees.append((index, obj))
+        for obj in map_data.objects('Decoration'):
+            self.chunk(obj.x, obj.y).decoration.append(obj)
+        # every chunk of the map exists,even empty ones still have ground
+        for y in range(0, map_data.height, self.chunk_pixels):
+            for x in range(0, map_data.width, self.chunk_pixels):
+                self.chunk(x, y)
+
+    def random_apples(self, name):
+        # like Tree.create_fruit
+        return sum(1 << slot for slot in range(len(APPLE_POS[name])) if randint(0, 10) < 2)
+
+    def tile_area(self, chunk):
+        rect = chunk.rect
+        return (rect.left // TILE_SIZE, rect.top // TILE_SIZE,
+                -(-rect.right // TILE_SIZE), -(-rect.bottom // TILE_SIZE))
+
+    def build(self, chunk):
+        # makes the sprites of a chunk a few at a time,every yield is a point where loading may pause
+        sprites = chunk.sprites
+        # ground,a part of the one big ground image
+        ground_rect = chunk.rect.clip(self.ground.get_rect())
+        if ground_rect:
+            sprites.append(Generic(ground_rect.topleft, self.ground.subsurface(ground_rect), self.all_sprites,
+                                   LAYERS['ground']))
+        yield
+
+        # house and fence,static tiles are composited into a few large surfaces instead of one sprite per tile
+        baker = StaticLayerBaker()
+        for layer, z, y_sort in BAKED_LAYERS:
+            for x, y, surf in chunk.tiles.get(layer, ()):
+                baker.add((x * TILE_SIZE, y * TILE_SIZE), surf, z, y_sort=y_sort)
+        sprites += baker.bake(self.all_sprites)
+        yield
+        # the fence still needs a hitbox
+        for x, y, surf in chunk.tiles.get('Fence', ()):
+            sprites.append(Generic((x * TILE_SIZE, y * TILE_SIZE), surf, self.collision_sprites))
+
+        # water
+        for x, y, surf in chunk.tiles.get('Water', ()):
+            sprites.append(Water((x * TILE_SIZE, y * TILE_SIZE), self.water_frames, self.all_sprites))
+        yield
+
+        # trees
+        for index, obj in chunk.trees:
+            tree = Tree(
+                pos=(obj.x, obj.y),
+                surf=obj.image,
+                groups=[self.all_sprites, self.collision_sprites, self.tree_sprites],
+                name=obj.name,
+                player_add=self.player_add,
+                state=self.tree_states[index]
+            )
+            tree.index = index
+            # a stump stays within the tiles of its tree
+            self.occupancy.place('tree', tree.rect, tree)
+            chunk.tree_sprites.append(tree)
+            yield
+
+        # wildflowers
+        for obj in chunk.decoration:
+            sprites.append(WildFlower((obj.x, obj.y), obj.image, [self.all_sprites, self.collision_sprites]))
+        yield
+
+        # soil,water and plants
+        self.soil_layer.load_area(*self.tile_area(chunk))
+        chunk.loaded = True
+
+    def load(self, chunk):
+        # finish loading a chunk right away
+        if chunk.job is None and not chunk.loaded:
+            chunk.job = self.build(chunk)
+            self.active.add(chunk)
+        if chunk.job is not None:
+            for _ in chunk.job:
+                pass
+            chunk.job = None
+
+    def unload(self, chunk):
+        self.active.discard(chunk)
+        if chunk.job is not None:
+            chunk.job.close()
+            chunk.job = None
+        for sprite in chunk.sprites:
+            sprite.kill()
+        chunk.sprites.clear()
+        for tree in chunk.tree_sprites:
+            self.tree_states[tree.index] = tree.state()
+            for apple in tree.apple_sprites.sprites():
+                apple.kill()
+            self.occupancy.remove('tree', tree)
+            tree.kill()
+        chunk.tree_sprites.clear()
+        if chunk.loaded:
+            self.soil_layer.unload_area(*self.tile_area(chunk))
+        chunk.loaded = False
+
+    def chunks_around(self, pos, radius):
+        center_x, center_y = int(pos[0] // self.chunk_pixels), int(pos[1] // self.chunk_pixels)
+        keys = [(x, y) for x in range(center_x - radius, center_x + radius + 1)
+                for y in range(center_y - radius, center_y + radius + 1) if (x, y) in self.chunks]
+        keys.sort(key=lambda key: (key[0] - center_x) ** 2 + (key[1] - center_y) ** 2)
+        return [self.chunks[key] for key in keys]
+
+    def load_around(self, pos):
+        # everything near pos at once,for the start of the level and after the player was moved
+        for chunk in self.chunks_around(pos, STREAM_LOAD_RADIUS):
+            self.load(chunk)
+        self.queue.clear()
+
+    def update(self, pos):
+        keep = set(self.chunks_around(pos, STREAM_EVICT_RADIUS))
+        for chunk in self.active - keep:
+            self.unload(chunk)
+
+        # the chunks on screen can't wait
+        view = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        view.center = pos
+        for chunk in self.chunks_around(pos, STREAM_LOAD_RADIUS):
+            if not chunk.loaded and chunk.job is None:
+                chunk.job = self.build(chunk)
+                self.active.add(chunk)
+                self.queue.append(chunk)
+            if chunk.job is not None and chunk.rect.colliderect(view):
+                self.load(chunk)
+
+        # the rest is time sliced
+        deadline = perf_counter() + STREAM_BUDGET / 1000
+        while self.queue and perf_counter() < deadline:
+            chunk = self.queue[0]
+            if chunk.job is None:
+                self.queue.popleft()
+                continue
+            try:
+                next(chunk.job)
+            except StopIteration:
+                chunk.job = None
+                self.queue.popleft()
+
+    @property
+    def loaded_chunks(self):
+        return sum(chunk.loaded for chunk in self.active)
+
+    def tree_list(self):
+        # (health, alive, apples) of every tree in map order,loaded or not
+        states = list(self.tree_states)
+        for tree in self.tree_sprites:
+            states[tree.index] = tree.state()
+        return states
+
+    def restore_trees(self, states):
+        self.tree_states = [tuple(state) for state in states]
+        for tree in self.tree_sprites:
+            tree.restore(*self.tree_states[tree.index])
+
+    def regrow_fruit(self):
+        # a new day,every living tree gets new apples
+        for tree in self.tree_sprites.sprites():
+            for apple in tree.apple_sprites.sprites():
+                apple.kill()
+            tree.create_fruit()
+        self.tree_states = [(health, alive, self.random_apples(obj.name) if alive else apples)
+                            for (health, alive, apples), obj in zip(self.tree_states, self.tree_objects)]
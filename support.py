@@ -1,25 +1,180 @@
 from os import walk
+from os.path import normpath
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pygame
+from settings import *
 
 
-def import_folder(path):
-    surface_list = []
+def folder_files(path):
+    # full paths of the files in a folder,sorted because the order of walk() depends on the file system
+    # and frames are named by their index.
+    files = []
     # walk(path) returns an array which contains objects of 3 group,we only need the last.
     for _, __, img_files in walk(path):
-        for image in img_files:
-            full_path = path + '/' + image
-            image_surf = pygame.image.load(full_path).convert_alpha()
-            image_surf = pygame.transform.scale(image_surf,
-                                                (image_surf.get_size()[0], image_surf.get_size()[1]))
-            surface_list.append(image_surf)
-    return surface_list
+        files += [path + '/' + image for image in sorted(img_files)]
+    return files
+
+
+def import_folder(path):
+    return [assets.image(full_path) for full_path in folder_files(path)]
 
 def import_folder_dict(path):
     surface_dict = {}
-    for _, __, img_files in walk(path):
-        for image in img_files:
-            full_path = path + '/' + image
-            image_surf = pygame.image.load(full_path).convert_alpha()
-            surface_dict[image.split('.')[0]] = image_surf
+    for full_path in folder_files(path):
+        image_surf = assets.image(full_path)
+        surface_dict[full_path.split('/')[-1].split('.')[0]] = image_surf
 
     return surface_dict
+
+
+class SilentSound:
+    def play(self, *args, **kwargs):
+        pass
+
+    def stop(self):
+        pass
+
+    def set_volume(self, value):
+        pass
+
+
+silent_sound = SilentSound()
+
+
+class AssetRegistry:
+    def __init__(self, max_items=None):
+        # path -> loaded asset,the least recently used one is evicted when max_items is set
+        self.cache = OrderedDict()
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, load):
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        self.misses += 1
+        asset = load()
+        self.store(key, asset)
+        return asset
+
+    def store(self, key, asset):
+        self.cache[key] = asset
+        if self.max_items is not None and len(self.cache) > self.max_items:
+            self.cache.popitem(last=False)
+
+    def preload(self, folders=(), folder_dicts=(), images=(), sounds=(), workers=4):
+        # decodes the files in a thread pool (the image and sound decoders release the gil) and yields
+        # (done, total) after each one,so the caller can show progress.
+        # convert_alpha needs the display and happens here,on the calling thread.
+        files = [('image', path) for folder in [*folders, *folder_dicts] for path in folder_files(normpath(folder))]
+        files += [('image', path) for path in images]
+        if pygame.mixer.get_init():
+            files += [('sound', path) for path in sounds]
+        keys = {(kind, normpath(path)) for kind, path in files} - self.cache.keys()
+
+        with ThreadPoolExecutor(workers) as pool:
+            futures = {pool.submit(pygame.image.load if kind == 'image' else pygame.mixer.Sound, path): (kind, path)
+                       for kind, path in keys}
+            for done, future in enumerate(as_completed(futures), 1):
+                kind, path = futures[future]
+                asset = future.result()
+                self.store((kind, path), asset.convert_alpha() if kind == 'image' else asset)
+                yield done, len(futures)
+
+        # the folders are put together from the cached images
+        for folder in folders:
+            self.folder(folder)
+        for folder in folder_dicts:
+            self.folder_dict(folder)
+
+    def image(self, path):
+        path = normpath(path)
+        return self.get(('image', path), lambda: pygame.image.load(path).convert_alpha())
+
+    def folder(self, path):
+        # the returned list and its surfaces are shared,don't modify them
+        path = normpath(path)
+        return self.get(('folder', path), lambda: import_folder(path))
+
+    def folder_dict(self, path):
+        path = normpath(path)
+        return self.get(('folder dict', path), lambda: import_folder_dict(path))
+
+    def sound(self, path):
+        path = normpath(path)
+        # without a mixer (headless runs) every sound is silent
+        if not pygame.mixer.get_init():
+            return silent_sound
+        return self.get(('sound', path), lambda: pygame.mixer.Sound(path))
+
+    def font(self, path, size):
+        path = normpath(path)
+        return self.get(('font', path, size), lambda: pygame.font.Font(path, size))
+
+    def clear(self):
+        self.cache.clear()
+
+
+# shared by the whole game,every surface and sound is loaded once per path
+assets = AssetRegistry()
+
+
+def tile_of(pos):
+    return int(pos[0] // TILE_SIZE), int(pos[1] // TILE_SIZE)
+
+
+def tiles_under(rect, size=TILE_SIZE):
+    # the cells of a grid of size pixels that a rect overlaps (tiles,collision cells,camera chunks)
+    return [(x, y)
+            for x in range(rect.left // size, (rect.right - 1) // size + 1)
+            for y in range(rect.top // size, (rect.bottom - 1) // size + 1)]
+
+
+class IndexedGroup(pygame.sprite.Group):
+    def __init__(self):
+        super().__init__()
+        # a group that keeps its sprites in an index of its own (camera chunks,collision cells).
+        # subclasses implement insert and remove_from_index,placements holds what remove_from_index needs.
+        self.placements = {}
+        # Sprite.__init__ adds the sprite to its groups before rect,z or hitbox exist,
+        # so new sprites wait here until the index is used next.
+        self.pending = []
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.pending.append(sprite)
+
+    def remove_internal(self, sprite):
+        if sprite in self.placements:
+            self.remove_from_index(sprite)
+        else:
+            self.pending.remove(sprite)
+        super().remove_internal(sprite)
+
+    def insert(self, sprite):
+        raise NotImplementedError
+
+    def remove_from_index(self, sprite):
+        raise NotImplementedError
+
+    def refresh(self, sprite):
+        # call this after the rect,z or hitbox of a sprite changed,see refresh_groups
+        if sprite in self.placements:
+            self.remove_from_index(sprite)
+            self.insert(sprite)
+
+    def flush_pending(self):
+        for sprite in self.pending:
+            self.insert(sprite)
+        self.pending.clear()
+
+
+def refresh_groups(sprite):
+    # let the indexed groups (camera, collision...) know that the rect, z or hitbox of a sprite changed
+    for group in sprite.groups():
+        if hasattr(group, 'refresh'):
+            group.refresh(sprite)
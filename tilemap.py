@@ -0,0 +1,33 @@
+from pytmx.util_pygame import load_pygame
+from settings import *
+from support import assets
+
+
+class MapData:
+    def __init__(self, path):
+        # the tmx file and its tilesets are parsed and converted once,every subsystem reads from here
+        self.tmx_data = load_pygame(path)
+
+        # dimensions
+        self.cols, self.rows = self.tmx_data.width, self.tmx_data.height
+        self.width, self.height = self.cols * TILE_SIZE, self.rows * TILE_SIZE
+
+        # layers and object groups by name
+        self.layers = {layer.name: layer for layer in self.tmx_data.layers}
+        self.farmable = [(x, y) for x, y, _ in self.tiles('Farmable')]
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def tiles(self, name):
+        # (x, y, surf) of every tile in a tile layer
+        return self.layers[name].tiles()
+
+    def objects(self, name):
+        # every object in an object group
+        return self.layers[name]
+
+
+def load_map(path='./data/map.tmx'):
+    return assets.get(('map', path), lambda: MapData(path))
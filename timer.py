@@ -1,25 +1,80 @@
-import pygame
+import heapq
+from itertools import count
+
+
+class ScheduledCall:
+    def __init__(self, due, func, interval):
+        self.due = due
+        self.func = func
+        self.interval = interval  # None for one-shot calls
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler:
+    def __init__(self):
+        # milliseconds of game time,only moves when update() is called
+        self.time = 0
+        # heap of (due, order, call),order keeps calls that are due at the same time in the order they were made
+        self.queue = []
+        self.order = count()
+
+    def get_ticks(self):
+        return self.time
+
+    def call_later(self, delay, func, repeat=False):
+        # run func after delay ms,and every delay ms after that when repeat is set
+        if repeat and delay <= 0:
+            raise ValueError('a repeating call needs a positive delay')
+        call = ScheduledCall(self.time + delay, func, delay if repeat else None)
+        heapq.heappush(self.queue, (call.due, next(self.order), call))
+        return call
+
+    def update(self, dt):
+        self.time += dt * 1000
+        # only the calls that are due are touched
+        while self.queue and self.queue[0][0] <= self.time:
+            _, _, call = heapq.heappop(self.queue)
+            if call.cancelled:
+                continue
+            if call.interval is not None:
+                call.due += call.interval
+                heapq.heappush(self.queue, (call.due, next(self.order), call))
+            call.func()
+
+    def clear(self):
+        self.time = 0
+        self.queue.clear()
+
+
+# the world stops while the shop is open
+game_clock = Scheduler()
 
 
 class Timer:
-    def __init__(self, duration, func=None):
+    def __init__(self, duration, func=None, clock=game_clock):
         self.duration = duration
         self.func = func
-        self.start_time = 0
+        self.clock = clock
+        self.call = None
         self.active = False
 
     def activate(self):
+        if self.call:
+            self.call.cancel()
         self.active = True
-        self.start_time = pygame.time.get_ticks()
+        self.call = self.clock.call_later(self.duration, self.finish)
 
     def deactivate(self):
+        if self.call:
+            self.call.cancel()
+            self.call = None
         self.active = False
-        self.start_time = 0
-
-    def update(self):
-        current_time = pygame.time.get_ticks()
-        if current_time - self.start_time >= self.duration:
-            # if self.func and self.start_time != 0:
-            if self.func:
-                self.func()
-            self.deactivate()
+
+    def finish(self):
+        self.call = None
+        if self.func:
+            self.func()
+        self.deactivate()
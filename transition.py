@@ -3,29 +3,34 @@ from settings import *
 
 
 class Transition:
-    def __init__(self, reset, player):
+    def __init__(self, reset, player, display_surface):
         # setup
-        self.display_surface = pygame.display.get_surface()
+        self.display_surface = display_surface
         self.reset = reset
         self.player = player
 
         # overlay image
         self.image = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
         self.color = 255
-        self.speed = -2
+        self.speed = -TRANSITION_SPEED
 
-    def play(self):
-        self.color += self.speed
+    def update(self, dt):
+        self.color += self.speed * dt
         if self.color <= 0:
-            self.speed = 1
+            # it takes twice as long to wake up
+            self.speed = TRANSITION_SPEED / 2
             self.color = 0
             self.reset()
         if self.color > 255:
             self.color = 255
-            self.speed = -2
+            self.speed = -TRANSITION_SPEED
             self.player.sleep = False
 
-        self.image.fill((self.color, self.color, self.color))
+    def display(self):
+        color = int(self.color)
+        self.image.fill((color, color, color))
         # 'special_flags=pygame.BLEND_RGBA_MULT' means the image has an alpha pipline.
         self.display_surface.blit(self.image, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+        # the whole screen fades
+        return None
 